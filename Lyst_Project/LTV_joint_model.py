@@ -3,7 +3,10 @@ import pandas as pd
 import matplotlib.pyplot as plt
 
 from lifelines import CoxPHFitter
-import statsmodels.api as sm
+
+import customer_features as features
+from joint_model import calculate_expected_value, fit_joint_model
+from random_intercept import fit_random_intercept
 
 
 
@@ -16,55 +19,15 @@ df.head()
 
 
 
+# Row loops replaced by the sorted, vectorized pass in customer_features.py
 def calc_repurchase_intervals():
-    intervals = []
-
-    for id, purchases in df.groupby('customer_id'):
-        purchases = purchases.sort_values('purchase_date')
-        
-        for i in range(len(purchases) - 1):
-            start = purchases.iloc[i]['purchase_date']
-            end = purchases.iloc[i + 1]['purchase_date']
-            interval = (end - start).days
-            
-            # Append the interval to the list
-            intervals.append(interval)
-    repurchase_window = np.percentile(intervals, 90)
-    return repurchase_window
-
+    events, starts = features.sort_purchases(df)
+    return features.repurchase_window(events, starts)
 
 
 def define_repurchased(purchase_data, censor_window):
-    repurchase_status = []
-
-    for i in range(len(purchase_data) - 1):
-        current_purchase = purchase_data.iloc[i]
-        next_purchase = purchase_data.iloc[i + 1]
-
-        days_between = (next_purchase['purchase_date'] - current_purchase['purchase_date']).days
-        if days_between <= censor_window:
-            repurchase_status.append({
-                'customer_id': current_purchase['customer_id'],
-                'purchase_date': current_purchase['purchase_date'],
-                'days_since_last_purchase': days_between,
-                'repurchased': 1 # purchased within the window
-            })
-        else:
-            repurchase_status.append({
-                'customer_id': current_purchase['customer_id'],
-                'purchase_date': current_purchase['purchase_date'],
-                'days_since_last_purchase': days_between,
-                'repurchased': 0 # not purchased within the window
-            })
-    
-    last_purchase = purchase_data.iloc[-1]
-    repurchase_status.append({
-        'customer_id': last_purchase['customer_id'],
-        'purchase_date': last_purchase['purchase_date'],
-        'days_since_last_purchase': 0,
-        'repurchased': 0 # last purchase is not a repurchase
-    })
-    return pd.DataFrame(repurchase_status)
+    events, starts = features.sort_purchases(purchase_data)
+    return features.label_repurchased(events, starts, censor_window)
 
 
 
@@ -74,32 +37,9 @@ repurchase_window = np.percentile(df['days_since_last_purchase'], 90)
 df['repurchased'] = df['days_since_last_purchase'].apply(lambda x: 1 if x <= repurchase_window else 0)
 
 
-survival_df = df.groupby('customer_id').agg({
-    'purchase_date': 'count',
-    'purchase_value': ['sum', 'mean', 'max'],
-    'repurchased': 'max',
-    'days_since_last_purchase': 'max',
-    'campaign_exposure': 'max',
-    'customer_segment': 'max',
-    'acquisition_channel': 'max',
-    'demographics': 'max'
-}).reset_index()
-
-
-survival_df.columns = ['_'.join(col).rstrip('_') for col in survival_df.columns]
-
-survival_df.rename(columns={
-    'purchase_date_count': 'n_purchases',
-    'purchase_value_sum': 'total_purchase_value',
-    'purchase_value_mean': 'avg_purchase_value',
-    'purchase_value_max': 'max_purchase_value',
-    'repurchased_max': 'repurchase_status',
-    'days_since_last_purchase_max': 'days_since_last_purchase',
-    'campaign_exposure_max': 'campaign_exposure',
-    'customer_segment_max': 'customer_segment',
-    'acquisition_channel_max': 'acquisition_channel',
-    'demographics_max': 'demographics'
-}, inplace=True)
+# per-customer survival table (same columns as the former groupby().agg())
+events, starts = features.sort_purchases(df)
+survival_df = features.survival_aggregates(events, starts)
 
 # survival model for time between purchases
 survival_model = CoxPHFitter()
@@ -127,25 +67,28 @@ plt.show()
 
 df.head()
 # longitudinal model for purchase frequency
-longitudinal_model = sm.MixedLM.from_formula(
+# random-intercept model fitted from per-customer sufficient statistics
+# (same estimates as sm.MixedLM.from_formula(..., groups=df['customer_id']))
+longitudinal_formula = (
     'purchase_value ~ campaign_exposure + days_since_first_purchase +' +
     'campaign_exposure:days_since_first_purchase +' +
     'campaign_exposure:customer_segment +' +
-    'customer_segment + acquisition_channel + demographics',
-    groups=df['customer_id'],
-    data=df
+    'customer_segment + acquisition_channel + demographics'
 )
-longitudinal_results = longitudinal_model.fit()
+longitudinal_results = fit_random_intercept(longitudinal_formula, df, groups='customer_id')
 print(longitudinal_results.summary())
 
 
 # JOINT MODEL
-joint_model = jointModelBayes(
-    longitudinal_object =longitudinal_model,
-    survival_object = survival_model,
-    id_var = 'customer_id', 
-    time_var = 'time_period'
+# purchase value and repurchase hazard linked through a shared customer random effect
+joint_model = fit_joint_model(
+    df,
+    longitudinal_formula=longitudinal_formula,
+    survival_formula='campaign_exposure + customer_segment + acquisition_channel + demographics',
+    id_var='customer_id',
+    date_var='purchase_date',
 )
+print(joint_model.summary())
 
 
 # Extract coefficients for campaign impact
@@ -0,0 +1,218 @@
+import hashlib
+import json
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+
+# Batched CausalImpact runs for every (metric x segment) series.
+#
+# Weekly panels for all metrics and segments come out of a single groupby over
+# the stacked treated + control daily data (week start via the vectorized
+# .dt.start_time accessor rather than a per-row apply). Each panel's fit is keyed
+# by a hash of its data plus the fit config; cached results are loaded from
+# disk and only new or changed series are sent to the process pool.
+
+# daily -> weekly aggregation, as in time_series.py
+WEEKLY_AGG = {
+    'revenue_per_user': 'mean',
+    'number_of_sessions': 'sum',
+    'number_of_signups': 'sum',
+    'avg_order_value': 'mean',
+    'seasonality_index': 'mean',
+}
+
+METRIC_LABELS = {
+    'revenue_per_user': 'Revenue per User',
+    'number_of_sessions': 'Sessions',
+    'number_of_signups': 'Signups',
+    'avg_order_value': 'Average Order Value',
+}
+
+CACHE_DIR = '.causalimpact_cache'
+
+
+class ImpactResult:
+    """The parts of a fitted CausalImpact the reports and plots use (picklable)."""
+
+    def __init__(self, summary_data, p_value, inferences, report):
+        self.summary_data = summary_data
+        self.p_value = p_value
+        self.inferences = inferences
+        self.report = report
+
+
+def build_weekly_panels(treated, control, metrics, intervention_start, segment_col=None, date_col='date'):
+    """Weekly [metric, metric_control] panels for each (metric, segment).
+
+    Returns (panels, weeks, periods), all keyed by (metric, segment): panels are
+    RangeIndex DataFrames ready for CausalImpact, weeks the matching week start
+    dates (for plotting), and periods the (pre_period, post_period) integer positions;
+    a week counts as post-intervention if any of its days is on or after
+    intervention_start (the 'max' of the daily flag in time_series.py). Series
+    with no pre- or no post-intervention weeks cannot be fitted and are skipped.
+    """
+    stacked = pd.concat([treated.assign(_arm=''), control.assign(_arm='_control')], ignore_index=True)
+    stacked[date_col] = pd.to_datetime(stacked[date_col])
+    stacked['week'] = stacked[date_col].dt.to_period('W').dt.start_time
+    stacked['intervention'] = (stacked[date_col] >= pd.Timestamp(intervention_start)).astype(int)
+    stacked['_segment'] = 'all' if segment_col is None else stacked[segment_col].astype(str)
+
+    agg = {m: WEEKLY_AGG.get(m, 'mean') for m in metrics}
+    agg['intervention'] = 'max'
+    weekly = stacked.groupby(['_segment', 'week', '_arm']).agg(agg).unstack('_arm')
+    weekly.columns = [f'{metric}{arm}' for metric, arm in weekly.columns]
+
+    panels, weeks, periods = {}, {}, {}
+    for segment, frame in weekly.groupby(level='_segment'):
+        frame = frame.droplevel('_segment')
+        flag = frame['intervention'].to_numpy()
+        for metric in metrics:
+            panel = frame[[metric, f'{metric}_control']].dropna()
+            key = (metric, segment)
+            post = flag[frame.index.get_indexer(panel.index)] == 1
+            pre_idx, post_idx = np.flatnonzero(~post), np.flatnonzero(post)
+            if not len(pre_idx) or not len(post_idx):
+                print(f'Skipping {key}: {len(pre_idx)} pre-intervention and {len(post_idx)} post-intervention weeks')
+                continue
+            panels[key] = panel.reset_index(drop=True)
+            weeks[key] = panel.index.to_series(index=np.arange(len(panel)))
+            periods[key] = ([int(pre_idx.min()), int(pre_idx.max())], [int(post_idx.min()), int(post_idx.max())])
+    return panels, weeks, periods
+
+
+def cache_key(panel, pre_period, post_period, fit_kwargs):
+    """Hash of the panel's values and columns plus the fit configuration."""
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(panel, index=True).to_numpy().tobytes())
+    config = {'columns': list(panel.columns), 'pre': pre_period, 'post': post_period, 'kwargs': fit_kwargs}
+    digest.update(json.dumps(config, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def _fit(panel, pre_period, post_period, fit_kwargs):
+    from tfcausalimpact.causalimpact.main import CausalImpact
+
+    ci = CausalImpact(panel, pre_period, post_period, **fit_kwargs)
+    return ImpactResult(ci.summary_data, ci.p_value, ci.inferences, ci.summary('report'))
+
+
+def run_impacts(panels, periods, fit_kwargs=None, cache_dir=CACHE_DIR, workers=None):
+    """Fit every panel (or load it from the cache); returns {key: ImpactResult}.
+
+    periods maps each panel key to (pre_period, post_period), as returned by
+    build_weekly_panels. Uncached fits run in a process pool and each one is
+    cached as soon as it finishes; if any fit fails, the others are still
+    cached and a RuntimeError naming the failed series is raised at the end.
+    """
+    fit_kwargs = fit_kwargs or {}
+    os.makedirs(cache_dir, exist_ok=True)
+    results, todo = {}, {}
+    for key, panel in panels.items():
+        pre_period, post_period = periods[key]
+        path = os.path.join(cache_dir, cache_key(panel, pre_period, post_period, fit_kwargs) + '.pkl')
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                results[key] = pickle.load(f)
+        else:
+            todo[key] = (path, panel, pre_period, post_period)
+
+    if todo:
+        print(f'Fitting {len(todo)} series ({len(results)} cached)')
+        workers = min(workers or os.cpu_count() or 1, len(todo))
+        # CausalImpact (and TensorFlow) is only imported inside the workers, so
+        # forking from a script that has not loaded it is safe
+        failed = {}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_fit, panel, pre, post, fit_kwargs): key
+                       for key, (_, panel, pre, post) in todo.items()}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    results[key] = future.result()
+                except Exception as e:
+                    print(f'Fit failed for {key}: {e}')
+                    failed[key] = e
+                    continue
+                with open(todo[key][0], 'wb') as f:
+                    pickle.dump(results[key], f)
+        if failed:
+            raise RuntimeError(f'{len(failed)} of {len(todo)} fits failed: {sorted(failed)}')
+    else:
+        print(f'All {len(results)} series loaded from cache')
+    return {key: results[key] for key in panels}
+
+
+def plot_impact(result, panel, weeks, post_start, title=None):
+    """The standard three-panel CausalImpact plot (what ci.plot() draws) from the
+    cached inferences: observed vs counterfactual, pointwise and cumulative effect."""
+    import matplotlib.pyplot as plt
+
+    inf = result.inferences
+    x = weeks.to_numpy()
+    fig, axes = plt.subplots(3, 1, figsize=(12, 9), sharex=True)
+    axes[0].plot(x, panel.iloc[:, 0].to_numpy(), color='black', label='Observed')
+    for ax, prefix, label in zip(axes, ['complete_preds', 'point_effects', 'post_cum_effects'],
+                                 ['Original', 'Pointwise', 'Cumulative']):
+        ax.plot(x, inf[f'{prefix}_means'].to_numpy(), linestyle='dashed', color='blue', label='Predicted')
+        ax.fill_between(x, inf[f'{prefix}_lower'].to_numpy(), inf[f'{prefix}_upper'].to_numpy(),
+                        color='blue', alpha=0.2, label='95% CI')
+        ax.axvline(x[post_start], color='red', linestyle='--', label='Intervention Start')
+        ax.set_ylabel(label)
+    for ax in axes[1:]:
+        ax.axhline(0, color='grey', linewidth=0.8)
+    axes[0].legend()
+    axes[0].set_title(title or 'Causal Impact Analysis')
+    axes[-1].set_xlabel('Week')
+    fig.tight_layout()
+    return fig
+
+
+def render_section(key, result, alpha=0.05):
+    metric, segment = key
+    label = METRIC_LABELS.get(metric, metric)
+    s = result.summary_data
+    title = label if segment == 'all' else f'{label} ({segment})'
+    significant = result.p_value < alpha
+    conclusion = (
+        f'The intervention led to a **statistically significant** change in {label.lower()}, '
+        f'with an average relative effect of **{s.loc["rel_effect", "average"] * 100:.2f}%** compared to the counterfactual.'
+        if significant else
+        f'No statistically significant effect on {label.lower()} at the {alpha:.0%} level '
+        f'(p = {result.p_value:.4f}).'
+    )
+    return f"""
+## Causal Impact Analysis Report: {title}
+
+**Post-Intervention Period Results**
+
+- **Observed Average {label}:** {s.loc['actual', 'average']:.2f}
+- **Predicted Average {label} (No Intervention):** {s.loc['predicted', 'average']:.2f}
+- **Estimated Absolute Uplift:** {s.loc['abs_effect', 'average']:.2f} (95% CI: {s.loc['abs_effect_lower', 'average']:.2f} – {s.loc['abs_effect_upper', 'average']:.2f})
+- **Estimated Relative Uplift:** {s.loc['rel_effect', 'average'] * 100:.2f}% (95% CI: {s.loc['rel_effect_lower', 'average'] * 100:.2f}% – {s.loc['rel_effect_upper', 'average'] * 100:.2f}%)
+
+**Cumulative Results (over post period)**
+
+- **Observed Cumulative {label}:** {s.loc['actual', 'cumulative']:.2f}
+- **Predicted Cumulative {label}:** {s.loc['predicted', 'cumulative']:.2f}
+- **Estimated Cumulative Uplift:** {s.loc['abs_effect', 'cumulative']:.2f}
+- **Cumulative Relative Uplift:** {s.loc['rel_effect', 'cumulative'] * 100:.2f}%
+
+**Statistical Significance**
+
+- **P-Value:** {result.p_value:.4f}
+- **Posterior Probability of a Real Effect:** {1 - result.p_value:.2%}
+
+---
+
+### Conclusion:
+
+{conclusion}
+"""
+
+
+def render_report(results, alpha=0.05):
+    return ''.join(render_section(key, result, alpha) for key, result in results.items())
@@ -0,0 +1,36 @@
+import numpy as np
+import patsy
+
+
+# patsy designs shared by the LTV models (joint_model.py, random_intercept.py).
+# The formula is compiled once, from a whole frame or incrementally from
+# chunks, and the same coding is then applied to any later data.
+
+
+class Design:
+    """patsy design for one submodel. The DesignInfo is kept so new data (chunks,
+    prediction profiles) is coded with the factor levels seen when fitting;
+    intercept=False drops the Intercept column but keeps treatment coding."""
+
+    def __init__(self, formula, data_iter_maker, intercept=True):
+        response, tilde, _ = formula.partition('~')
+        if tilde:
+            self.y_info, self.x_info = patsy.incr_dbuilders(formula, data_iter_maker, NA_action='raise')
+            self.response = response.strip()
+        else:
+            self.y_info, self.x_info = None, patsy.incr_dbuilder(formula, data_iter_maker, NA_action='raise')
+            self.response = None
+        self.keep = [i for i, name in enumerate(self.x_info.column_names) if intercept or name != 'Intercept']
+        self.names = [self.x_info.column_names[i] for i in self.keep]
+
+    @classmethod
+    def from_frame(cls, formula, data, intercept=True):
+        return cls(formula, lambda: iter([data]), intercept)
+
+    def matrix(self, data):
+        X = patsy.build_design_matrices([self.x_info], data, NA_action='raise')[0]
+        return np.asarray(X)[:, self.keep]
+
+    def outcome(self, data):
+        y = patsy.build_design_matrices([self.y_info], data, NA_action='raise')[0]
+        return np.asarray(y)[:, 0]
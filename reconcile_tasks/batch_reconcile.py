@@ -0,0 +1,133 @@
+import argparse
+import glob
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+from reconcile import load_profile, reconcile_period
+
+# ============================
+# 批量对账：多个月份并行，每期单独输出 + 一份汇总
+# ============================
+# 用法示例：
+#   python batch_reconcile.py --book "corp_*.csv" --bank "bank_*.csv" --profile my_bank.json
+#   python batch_reconcile.py --manifest manifest.json --out-dir out --workers 4
+#   python batch_reconcile.py --book "corp_*.csv" --bank "bank_*.csv" --state reconcile_state.db  # 每日增量
+#   python batch_reconcile.py --book "corp_*.csv" --bank "bank_*.csv" --other-banks "gf_{period}.csv" "icbc_{period}.csv"
+# --profile 只需写与 reconcile.DEFAULT_PROFILE 不同的节和键
+# manifest 为 JSON 列表或 CSV，字段：period, book, bank，可选 other_banks（列表或以 ; 分隔）
+
+
+def period_key(path):
+    """从文件名取期间键：corp_07.csv → 07；用于把公司账与银行流水按期间配对"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return stem.split("_", 1)[1] if "_" in stem else stem
+
+
+def pair_by_glob(book_pattern, bank_pattern):
+    books = {period_key(p): p for p in sorted(glob.glob(book_pattern))}
+    banks = {period_key(p): p for p in sorted(glob.glob(bank_pattern))}
+    for missing in sorted(set(books) ^ set(banks)):
+        print(f"⚠️ 期间 {missing} 缺少{'银行流水' if missing in books else '公司账'}，已跳过")
+    return [{"period": k, "book": books[k], "bank": banks[k]} for k in sorted(set(books) & set(banks))]
+
+
+def read_manifest(path):
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+    else:
+        entries = pd.read_csv(path, dtype=str).to_dict("records")
+    jobs = []
+    for e in entries:
+        others = e.get("other_banks")
+        if isinstance(others, str):
+            others = [p for p in others.split(";") if p]
+        elif not isinstance(others, list):
+            others = []  # CSV 清单中的空单元格为 NaN
+        jobs.append({"period": e.get("period") or period_key(e["book"]), "book": e["book"], "bank": e["bank"],
+                     "other_banks": others})
+    return jobs
+
+
+def attach_other_banks(jobs, patterns):
+    """按期间展开 --other-banks 模板（{period} 占位），只保留存在的文件"""
+    for job in jobs:
+        found = []
+        for pattern in patterns:
+            found += sorted(glob.glob(pattern.format(period=job["period"])))
+        job["other_banks"] = [p for p in found if p != job["bank"]]
+    return jobs
+
+
+def _run_one(job, profile, out_dir, state_path=None):
+    period = job["period"]
+    summary = reconcile_period(
+        job["book"],
+        job["bank"],
+        profile,
+        output=os.path.join(out_dir, f"company_book_reconciled_{period}.xlsx"),
+        split_output=os.path.join(out_dir, f"split_groups_{period}.csv"),
+        period=period,
+        state_path=state_path,
+        other_banks=job.get("other_banks"),
+        transfer_output=os.path.join(out_dir, f"transfers_{period}.csv")
+    )
+    summary["公司账文件"] = job["book"]
+    summary["银行文件"] = job["bank"]
+    return summary
+
+
+def run_batch(jobs, profile, out_dir, workers=None, state_path=None):
+    """进程池并行对账；单期失败不影响其它期，错误记录在汇总表里"""
+    os.makedirs(out_dir, exist_ok=True)
+    summaries = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_run_one, job, profile, out_dir, state_path): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                summaries.append(future.result())
+                print(f"✅ 期间 {job['period']} 完成")
+            except Exception as e:
+                print(f"❌ 期间 {job['period']} 失败：{e}")
+                summaries.append({"期间": job["period"], "公司账文件": job["book"], "银行文件": job["bank"], "错误": str(e)})
+
+    summary = pd.DataFrame(summaries).sort_values("期间").reset_index(drop=True)
+    summary_path = os.path.join(out_dir, "reconcile_summary.xlsx")
+    summary.to_excel(summary_path, index=False)
+    print(f"📊 汇总已生成：{summary_path}")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="按配置批量对账多个期间（公司账 vs 银行流水）")
+    parser.add_argument("--book", help="公司账文件 glob，例如 'corp_*.csv'")
+    parser.add_argument("--bank", help="银行流水文件 glob，例如 'bank_*.csv'")
+    parser.add_argument("--manifest", help="期间清单（JSON 列表或 CSV，字段 period/book/bank）")
+    parser.add_argument("--profile", help="列映射配置（JSON 或 YAML），缺省用内置默认配置")
+    parser.add_argument("--out-dir", default="reconciled", help="输出目录")
+    parser.add_argument("--workers", type=int, default=None, help="进程数，缺省为 CPU 核数")
+    parser.add_argument("--state", help="增量对账状态库（SQLite），只处理新增及未匹配行")
+    parser.add_argument("--other-banks", nargs="*", default=[],
+                        help="公司其它账户的同期流水 glob，{period} 为期间占位；用于跨账户内部转账配对")
+    args = parser.parse_args(argv)
+
+    if args.manifest:
+        jobs = read_manifest(args.manifest)
+    elif args.book and args.bank:
+        jobs = pair_by_glob(args.book, args.bank)
+    else:
+        parser.error("需要 --manifest，或同时提供 --book 与 --bank")
+    if not jobs:
+        parser.error("没有找到可对账的期间")
+    if args.other_banks:
+        jobs = attach_other_banks(jobs, args.other_banks)
+
+    print(f"🗂️ 共 {len(jobs)} 期待对账")
+    return run_batch(jobs, load_profile(args.profile), args.out_dir, args.workers, args.state)
+
+
+if __name__ == "__main__":
+    main()
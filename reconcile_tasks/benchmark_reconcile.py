@@ -0,0 +1,140 @@
+import argparse
+import multiprocessing
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from synth_ledger import generate_ledger, write_ledger
+
+# ============================
+# 对账基准：合成数据上各匹配模式的吞吐、峰值内存与准确率
+# ============================
+# 每个 (规模, 模式) 在独立子进程中运行：读取 CSV → 匹配 → 与真实对应比对。
+# 子进程用 spawn 启动（fork 出的子进程 ru_maxrss 从父进程的内存算起，会把生成数据的占用算进去），
+# 峰值内存取子进程的 ru_maxrss，另报导入模块后的基线，二者之差才是读取 + 匹配的开销。
+# 用法示例：
+#   python benchmark_reconcile.py --sizes 1000 10000 100000
+#   python benchmark_reconcile.py --sizes 1000000 --modes closest closest_text --out benchmark.csv
+
+MODES = ["closest", "closest_text", "one_to_one", "one_to_one_text", "split"]
+
+
+def _truth_sets(truth):
+    """真实对应：逐对集合（余额匹配用）与拆分组集合（拆分匹配用）
+
+    余额只在事件的最后一行两侧相同（拆分的中间行是部分入账后的余额），
+    所以余额匹配的真实对应是每个两侧都有的事件各自最后一行组成的一对。
+    """
+    linked = truth[(truth["book_row"] >= 0) & (truth["bank_row"] >= 0)]
+    last = linked.groupby("event")[["book_row", "bank_row"]].max()
+    pairs = set(zip(last["book_row"].tolist(), last["bank_row"].tolist()))
+    matchable_rows = set(last["book_row"].tolist())
+    split = linked[linked["kind"].isin(["bank_split", "book_split"])]
+    groups = {
+        (frozenset(g["book_row"].tolist()), frozenset(g["bank_row"].tolist()))
+        for _, g in split.groupby("event")
+    }
+    return pairs, matchable_rows, groups
+
+
+def _precision_recall(tp, predicted, actual):
+    precision = tp / predicted if predicted else float("nan")
+    recall = tp / actual if actual else float("nan")
+    return precision, recall
+
+
+def run_mode(mode, corp_path, bank_path, truth_path):
+    """子进程入口：读取、匹配、评估，返回一行结果"""
+    from matching import match_balances, match_balances_one_to_one
+    from reconcile import load_bank, load_corp, load_profile
+    from split_match import match_split_transactions
+
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    profile = load_profile()
+    m = profile["match"]
+    t0 = time.perf_counter()
+    corp = load_corp(corp_path, profile)
+    bank = load_bank(bank_path, profile)
+    load_seconds = time.perf_counter() - t0
+
+    pairs, matchable_rows, groups = _truth_sets(pd.read_csv(truth_path))
+    text = {"text_cols": (profile["corp"]["text_cols"], profile["bank"]["text_cols"]),
+            "min_text_score": m["min_text_score"]} if mode.endswith("_text") else {}
+
+    t0 = time.perf_counter()
+    if mode == "split":
+        sp = profile["split"]
+        result, _ = match_split_transactions(corp, bank, sp["tol_days"], sp["tol_amt"], sp["max_group"],
+                                             sp["max_candidates"])
+        match_seconds = time.perf_counter() - t0
+        predicted = {(frozenset(b), frozenset(k)) for b, k in zip(result["账行"], result["银行行"])}
+        tp = len(predicted & groups)
+        precision, recall = _precision_recall(tp, len(predicted), len(groups))
+    else:
+        fn = match_balances_one_to_one if mode.startswith("one_to_one") else match_balances
+        out = fn(corp, bank, m["tol_days"], m["tol_amt"], with_bank_row=True, **text)
+        match_seconds = time.perf_counter() - t0
+        ok = out[out["匹配状态"] == "正常"]
+        predicted = list(zip(ok.index.tolist(), ok["_bank_row"].tolist()))
+        tp = sum(pair in pairs for pair in predicted)
+        precision, recall = _precision_recall(tp, len(predicted), len(matchable_rows))
+
+    return {
+        "模式": mode,
+        "公司账行数": len(corp),
+        "银行行数": len(bank),
+        "读取秒数": round(load_seconds, 3),
+        "匹配秒数": round(match_seconds, 3),
+        "匹配行/秒": round(len(corp) / match_seconds) if match_seconds else float("inf"),
+        # Linux 上 ru_maxrss 单位为 KB
+        "基线内存MB": round(baseline_kb / 1024, 1),
+        "峰值内存MB": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "precision": round(precision, 4),
+        "recall": round(recall, 4),
+    }
+
+
+def benchmark(sizes, modes=MODES, seed=0, data_dir=None, **gen_kwargs):
+    """对每个规模生成一次数据，逐个模式在新进程中跑，返回结果 DataFrame"""
+    rows = []
+    spawn = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = data_dir or tmp
+        for size in sizes:
+            t0 = time.perf_counter()
+            book, bank, truth = generate_ledger(size, seed=seed, **gen_kwargs)
+            paths = write_ledger(book, bank, truth, data_dir, name=str(size))
+            del book, bank, truth
+            print(f"🧪 规模 {size:,}：数据生成 {time.perf_counter() - t0:.1f}s")
+            for mode in modes:
+                with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as executor:
+                    result = executor.submit(run_mode, mode, *paths).result()
+                result = {"规模": size, **result}
+                print(f"   {mode:<16} {result['匹配行/秒']:>12,} 行/秒  峰值 {result['峰值内存MB']:>8} MB（基线 {result['基线内存MB']}）  "
+                      f"P={result['precision']:.3f} R={result['recall']:.3f}")
+                rows.append(result)
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="合成数据上的对账匹配基准")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--jitter-rate", type=float, default=0.3)
+    parser.add_argument("--split-rate", type=float, default=0.03)
+    parser.add_argument("--missing-rate", type=float, default=0.02)
+    parser.add_argument("--noise-rate", type=float, default=0.05)
+    parser.add_argument("--data-dir", default=None, help="保留生成的数据文件（缺省用临时目录）")
+    parser.add_argument("--out", default="benchmark_reconcile.csv")
+    args = parser.parse_args()
+
+    report = benchmark(args.sizes, args.modes, seed=args.seed, data_dir=args.data_dir,
+                       jitter_rate=args.jitter_rate, split_rate=args.split_rate,
+                       missing_rate=args.missing_rate, noise_rate=args.noise_rate)
+    report.to_csv(args.out, index=False)
+    print(f"📊 基准结果已保存：{args.out}")
+    print(report.to_string(index=False))
@@ -1,11 +1,242 @@
-from pyxlsb import open_workbook
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import pandas as pd
+from pyxlsb import open_workbook
+
+# ============================
+# XLSB → Parquet / CSV / XLSX 流式转换
+# ============================
+# 逐块读取行（不再把整张表读成 list of lists），边读边推断列类型并直接写出；
+# 所有 sheet、所有文件在进程池中并行转换。
+# 用法示例：
+#   python convert.py dvd_2025_01.xlsb --format parquet --date-cols 起息日
+#   python convert.py "exports/*.xlsb" --format csv --out-dir converted --workers 4
+
+CHUNK_ROWS = 50_000
+
+
+def _unique_headers(raw):
+    """表头去重、补空：与 pandas 读 CSV 一致，第二个“其他”变成“其他.1”"""
+    headers, seen = [], {}
+    for i, name in enumerate(raw):
+        name = str(name).strip() if name not in (None, "") else f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        headers.append(name)
+    return headers
+
+
+class TypeTracker:
+    """按块累积推断列类型：空 → 数值/布尔 → 文本，只升级不降级"""
+
+    def __init__(self, columns, date_cols=()):
+        self.kinds = {col: "empty" for col in columns}
+        self.date_cols = set(date_cols)
+        self.frozen = False
+        self.coerced = {}
+
+    def update(self, chunk):
+        if self.frozen:
+            return
+        for col in chunk.columns:
+            if self.kinds[col] == "string":
+                continue
+            values = chunk[col].dropna()
+            if values.empty:
+                continue
+            if col in self.date_cols:
+                kind = "date"
+            elif values.map(lambda v: isinstance(v, bool)).all():
+                kind = "bool"
+            elif values.map(lambda v: isinstance(v, (int, float)) and not isinstance(v, bool)).all():
+                kind = "float"
+            else:
+                kind = "string"
+            current = self.kinds[col]
+            self.kinds[col] = kind if current in ("empty", kind) else "string"
+
+    def apply(self, chunk):
+        out = {}
+        for col in chunk.columns:
+            kind = self.kinds[col]
+            if kind == "date":
+                # XLSB 日期是 Excel 序列号（1899-12-30 起的天数）；文本日期也能解析
+                serial = pd.to_numeric(chunk[col], errors="coerce")
+                parsed = pd.to_datetime(serial, unit="D", origin="1899-12-30")
+                out[col] = parsed.fillna(pd.to_datetime(chunk[col].where(serial.isna()), errors="coerce"))
+            elif kind == "float":
+                out[col] = pd.to_numeric(chunk[col], errors="coerce").astype("float64")
+                lost = int((chunk[col].notna() & out[col].isna()).sum())
+                if lost:
+                    self.coerced[col] = self.coerced.get(col, 0) + lost
+            elif kind == "bool":
+                out[col] = chunk[col].astype("boolean")
+            else:
+                out[col] = chunk[col].map(lambda v: None if v is None else str(v)).astype("string")
+        return pd.DataFrame(out, columns=chunk.columns)
+
+
+def iter_sheet_chunks(xlsb_path, sheet, chunk_rows=CHUNK_ROWS):
+    """逐块产出 (表头, 原始值 DataFrame)；第一行作为表头"""
+    with open_workbook(xlsb_path) as wb:
+        with wb.get_sheet(sheet) as ws:
+            rows = ws.rows()
+            header = next(rows, None)
+            if header is None:
+                return
+            columns = _unique_headers([c.v for c in header])
+            width = len(columns)
+            buffer = []
+            for row in rows:
+                values = [c.v for c in row][:width]
+                values += [None] * (width - len(values))
+                buffer.append(values)
+                if len(buffer) >= chunk_rows:
+                    yield columns, pd.DataFrame(buffer, columns=columns, dtype=object)
+                    buffer = []
+            if buffer:
+                yield columns, pd.DataFrame(buffer, columns=columns, dtype=object)
+
+
+class _ParquetSink:
+    def __init__(self, path):
+        self.path = path
+        self.writer = None
+
+    def write(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, table.schema)
+        elif not table.schema.equals(self.writer.schema):
+            table = table.cast(self.writer.schema, safe=False)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class _CsvSink:
+    def __init__(self, path):
+        self.path = path
+        self.header = True
+
+    def write(self, df):
+        df.to_csv(self.path, mode="w" if self.header else "a", header=self.header, index=False,
+                  encoding="utf-8-sig" if self.header else "utf-8")
+        self.header = False
+
+    def close(self):
+        pass
+
+
+class _XlsxSink:
+    def __init__(self, path, sheet_title):
+        from openpyxl import Workbook
+
+        self.path = path
+        self.wb = Workbook(write_only=True)
+        self.ws = self.wb.create_sheet(sheet_title[:31])
+        self.header = True
+
+    def write(self, df):
+        if self.header:
+            self.ws.append(list(df.columns))
+            self.header = False
+        values = df.astype(object).where(df.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            self.ws.append([v.to_pydatetime() if isinstance(v, pd.Timestamp) else v for v in row])
+
+    def close(self):
+        self.wb.save(self.path)
+
+
+def convert_sheet(xlsb_path, sheet, out_dir, fmt="parquet", chunk_rows=CHUNK_ROWS, date_cols=()):
+    """把一个 sheet 流式转换为一个输出文件，返回 (输出路径, 行数)。
+
+    列类型在块之间逐步推断（CSV / XLSX 只升级不降级）；Parquet 的 schema 由
+    第一块确定后冻结，之后的块按该 schema 转换，无法转换的数值会置空并告警。
+    第一块中全空的列统一写成文本。
+    """
+    stem = os.path.splitext(os.path.basename(xlsb_path))[0]
+    out_path = os.path.join(out_dir, f"{stem}__{sheet}.{fmt}")
+    if fmt == "parquet":
+        sink = _ParquetSink(out_path)
+    elif fmt == "csv":
+        sink = _CsvSink(out_path)
+    elif fmt == "xlsx":
+        sink = _XlsxSink(out_path, str(sheet))
+    else:
+        raise ValueError(f"不支持的输出格式：{fmt}")
+
+    tracker = None
+    n_rows = 0
+    try:
+        for columns, chunk in iter_sheet_chunks(xlsb_path, sheet, chunk_rows):
+            if tracker is None:
+                tracker = TypeTracker(columns, date_cols)
+                tracker.update(chunk)
+                # 第一块里全空的列无从推断，按文本处理，保证 Parquet schema 稳定
+                for col, kind in tracker.kinds.items():
+                    if kind == "empty":
+                        tracker.kinds[col] = "string"
+                tracker.frozen = fmt == "parquet"
+            else:
+                tracker.update(chunk)
+            sink.write(tracker.apply(chunk))
+            n_rows += len(chunk)
+    finally:
+        sink.close()
+    if tracker is not None and tracker.coerced:
+        print(f"⚠️ {xlsb_path} [{sheet}] 以下列有非数值内容被置空：{tracker.coerced}")
+    return out_path, n_rows
+
+
+def list_sheets(xlsb_path):
+    with open_workbook(xlsb_path) as wb:
+        return list(wb.sheets)
+
+
+def convert_files(paths, out_dir, fmt="parquet", chunk_rows=CHUNK_ROWS, date_cols=(), workers=None):
+    """所有文件的所有 sheet 并行转换"""
+    os.makedirs(out_dir, exist_ok=True)
+    tasks = [(path, sheet) for path in paths for sheet in list_sheets(path)]
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(convert_sheet, path, sheet, out_dir, fmt, chunk_rows, tuple(date_cols)): (path, sheet)
+            for path, sheet in tasks
+        }
+        for future in as_completed(futures):
+            path, sheet = futures[future]
+            try:
+                out_path, n_rows = future.result()
+                print(f"✅ {path} [{sheet}] → {out_path}（{n_rows} 行）")
+                results.append((path, sheet, out_path, n_rows))
+            except Exception as e:
+                print(f"❌ {path} [{sheet}] 转换失败：{e}")
+    return results
+
 
-xlsb_path = "dvd_2025_01.xlsb"
+if __name__ == "__main__":
+    import glob
 
-with open_workbook(xlsb_path) as wb:
-    with wb.get_sheet(1) as sheet:  # 你也可以用 sheet 名称
-        data = [[item.v for item in row] for row in sheet.rows()]
-        df = pd.DataFrame(data[1:], columns=data[0])  # 第一行作为表头
+    parser = argparse.ArgumentParser(description="XLSB 流式转换为 Parquet / CSV / XLSX（全部 sheet，并行）")
+    parser.add_argument("inputs", nargs="*", default=["dvd_2025_01.xlsb"], help="xlsb 文件或 glob")
+    parser.add_argument("--format", choices=["parquet", "csv", "xlsx"], default="parquet")
+    parser.add_argument("--out-dir", default="converted")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--date-cols", nargs="*", default=[], help="按 Excel 日期序列号解析的列，如 起息日")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
 
-df.to_excel("converted.xlsx", index=False)
+    paths = sorted({p for pattern in args.inputs for p in (glob.glob(pattern) or [pattern])})
+    convert_files(paths, args.out_dir, args.format, args.chunk_rows, args.date_cols, args.workers)
@@ -0,0 +1,66 @@
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.formatting.rule import FormulaRule
+from openpyxl.styles import PatternFill
+from openpyxl.utils import get_column_letter
+
+# 匹配状态 → 底色；状态字符串必须与 matching.py 实际输出一致
+GREEN = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
+YELLOW = PatternFill(start_color="FFEB9C", end_color="FFEB9C", fill_type="solid")
+RED = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
+
+STATUS_FILLS = {
+    "正常": GREEN,        # 余额在容差内
+    "余额异常": YELLOW,   # 找到银行记录但余额差超出容差
+    "银行无数据": RED,    # 日期窗口内没有银行记录
+    "重复占用": RED,      # 一对一模式下对应银行记录已被其他行占用
+}
+
+
+def _iter_chunks(data, chunk_size):
+    if isinstance(data, pd.DataFrame):
+        for start in range(0, len(data), chunk_size):
+            yield data.iloc[start:start + chunk_size]
+    else:
+        yield from data
+
+
+def _rows(chunk):
+    """DataFrame 块 → Excel 可写的行：NaN/NaT → 空单元格，Timestamp → datetime"""
+    values = chunk.astype(object).where(chunk.notna(), None)
+    for row in values.itertuples(index=False, name=None):
+        yield [v.to_pydatetime() if isinstance(v, pd.Timestamp) else v for v in row]
+
+
+def write_reconciled(data, output, status_col="匹配状态", sheet_title="Reconciled_Book", chunk_size=50_000):
+    """一次写出对账结果：write-only 流式写行 + 整行条件格式着色。
+
+    data 可以是 DataFrame，也可以是列一致的 DataFrame 块迭代器；内存只与块大小有关。
+    不再先 to_excel、再 load_workbook 逐格填色、再保存。返回写出的数据行数。
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_title)
+    ws.freeze_panes = "A2"
+
+    columns = None
+    n_rows = 0
+    for chunk in _iter_chunks(data, chunk_size):
+        if columns is None:
+            columns = list(chunk.columns)
+            ws.append(columns)
+        for row in _rows(chunk):
+            ws.append(row)
+        n_rows += len(chunk)
+
+    if columns is None:
+        raise ValueError("没有可写出的数据")
+
+    if n_rows:
+        status_letter = get_column_letter(columns.index(status_col) + 1)
+        cell_range = f"A2:{get_column_letter(len(columns))}{n_rows + 1}"
+        for status, fill in STATUS_FILLS.items():
+            rule = FormulaRule(formula=[f'${status_letter}2="{status}"'], fill=fill, stopIfTrue=True)
+            ws.conditional_formatting.add(cell_range, rule)
+
+    wb.save(output)
+    return n_rows
@@ -0,0 +1,198 @@
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from integrity import is_newest_first
+from matching import MATCH_COLUMNS, match_balances, match_balances_one_to_one
+
+# ============================
+# 增量对账：SQLite 记录已匹配的 (公司账行, 银行行) 与每个账户的高水位
+# ============================
+# 流水只会按时间往后追加（倒序导出的银行新行在文件开头，按时间顺序看同样是追加）。
+# 每次运行只处理新增行和上次未匹配成功的行；已“正常”匹配的行直接从状态库取回结果。
+# 行用内容指纹标识（同内容重复行按时间顺序的出现次序区分），与行号无关，
+# 追加新行不会改变旧行的指纹。
+
+BOOK_KEY_COLS = ["date", "summary", "corp_balance", "net"]
+BANK_KEY_COLS = ["date", "type", "net", "bank_balance"]
+# 这些状态视为已定稿，后续运行不再重算
+FINAL_STATUSES = ("正常",)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    account TEXT NOT NULL,
+    book_fp TEXT NOT NULL,
+    bank_fp TEXT,
+    match_date TEXT,
+    bank_type TEXT,
+    bank_amount REAL,
+    diff REAL,
+    status TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (account, book_fp)
+);
+CREATE INDEX IF NOT EXISTS matches_bank ON matches (account, bank_fp);
+CREATE TABLE IF NOT EXISTS watermarks (
+    account TEXT PRIMARY KEY,
+    bank_rows INTEGER NOT NULL,
+    bank_last_fp TEXT,
+    book_rows INTEGER NOT NULL,
+    updated_at TEXT NOT NULL
+);
+"""
+
+
+def row_fingerprints(df, cols):
+    """按内容生成稳定指纹：列值哈希 + 同哈希行的出现序号"""
+    if len(df) == 0:
+        return np.array([], dtype=object)
+    key = pd.util.hash_pandas_object(df[cols], index=False)
+    occurrence = key.groupby(key).cumcount()
+    return (key.map("{:016x}".format) + "-" + occurrence.astype(str)).to_numpy()
+
+
+class ReconcileState:
+    """对账状态库（一个 SQLite 文件，可存多个账户）"""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)  # 批量对账多进程共用一个库
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def watermark(self, account):
+        row = self.conn.execute(
+            "SELECT bank_rows, bank_last_fp, book_rows FROM watermarks WHERE account = ?",
+            (account,)
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(["bank_rows", "bank_last_fp", "book_rows"], row))
+
+    def set_watermark(self, account, bank_rows, bank_last_fp, book_rows):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO watermarks (account, bank_rows, bank_last_fp, book_rows, updated_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (account, bank_rows, bank_last_fp, book_rows, datetime.now().isoformat(timespec="seconds"))
+        )
+        self.conn.commit()
+
+    def reset(self, account):
+        self.conn.execute("DELETE FROM matches WHERE account = ?", (account,))
+        self.conn.execute("DELETE FROM watermarks WHERE account = ?", (account,))
+        self.conn.commit()
+
+    def final_matches(self, account):
+        """已定稿的匹配：DataFrame，索引为 book_fp"""
+        marks = ",".join("?" * len(FINAL_STATUSES))
+        return pd.read_sql_query(
+            f"SELECT book_fp, bank_fp, match_date, bank_type, bank_amount, diff, status FROM matches "
+            f"WHERE account = ? AND status IN ({marks})",
+            self.conn, params=(account, *FINAL_STATUSES), index_col="book_fp"
+        )
+
+    def save_matches(self, account, book_fps, bank_fps, result):
+        now = datetime.now().isoformat(timespec="seconds")
+        dates = pd.to_datetime(result["匹配日期"])
+        rows = zip(
+            [account] * len(book_fps), book_fps, bank_fps,
+            [None if pd.isna(d) else d.isoformat() for d in dates],
+            [None if pd.isna(t) else str(t) for t in result["银行交易类型"]],
+            [None if pd.isna(v) else float(v) for v in result["银行金额"]],
+            [None if pd.isna(v) else float(v) for v in result["金额差额"]],
+            result["匹配状态"].tolist(),
+            [now] * len(book_fps),
+        )
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO matches (account, book_fp, bank_fp, match_date, bank_type, bank_amount, diff, "
+            "status, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+        self.conn.commit()
+
+
+def _check_append_only(state, account, bank_fps):
+    """bank_fps 按时间顺序。上次最晚的一行仍在原位置 → 只是追加；否则流水被改写，清空该账户状态全量重算"""
+    mark = state.watermark(account)
+    if mark is None:
+        return 0
+    n = mark["bank_rows"]
+    if n <= len(bank_fps) and (n == 0 or bank_fps[n - 1] == mark["bank_last_fp"]):
+        return n
+    print(f"⚠️ 账户 {account} 的银行流水不是在原有基础上追加，已清空状态并全量重算")
+    state.reset(account)
+    return 0
+
+
+def match_incremental(corp, bank, match_cfg, state, account, **match_kwargs):
+    """增量版余额匹配，返回与 corp 同索引、列为 MATCH_COLUMNS 的 DataFrame 与待处理行掩码。
+
+    已定稿的行直接取回；其余行（新增或上次未匹配成功）只与其日期窗口内的银行记录匹配。
+    一对一模式下，已被定稿匹配占用的银行记录不再参与。match_kwargs 原样传给匹配函数（如 text_cols）。
+    """
+    book_fps = row_fingerprints(corp, BOOK_KEY_COLS)
+    # 指纹与追加检查都按时间顺序；倒序导出的流水先翻转，算完再按文件顺序放回
+    newest_first = is_newest_first(bank)
+    chrono_fps = row_fingerprints(bank.iloc[::-1] if newest_first else bank, BANK_KEY_COLS)
+    seen_bank_rows = _check_append_only(state, account, chrono_fps)
+    bank_fps = chrono_fps[::-1] if newest_first else chrono_fps
+
+    final = state.final_matches(account)
+    done = pd.Index(book_fps).isin(final.index)
+    pending = corp[~done]
+
+    out = pd.DataFrame(index=corp.index, columns=MATCH_COLUMNS)
+    if done.any():
+        stored = final.loc[book_fps[done]]
+        out.loc[done, "匹配日期"] = pd.to_datetime(stored["match_date"]).to_numpy()
+        out.loc[done, "银行交易类型"] = stored["bank_type"].to_numpy()
+        out.loc[done, "银行金额"] = stored["bank_amount"].to_numpy()
+        out.loc[done, "金额差额"] = stored["diff"].to_numpy()
+        out.loc[done, "匹配状态"] = stored["status"].to_numpy()
+
+    if len(pending):
+        tol = pd.Timedelta(days=match_cfg["tol_days"])
+        dates = pending["date"].dropna()
+        candidates = np.zeros(len(bank), dtype=bool)
+        if len(dates):
+            candidates = bank["date"].between(dates.min() - tol, dates.max() + tol).to_numpy()
+        if match_cfg["mode"] == "one_to_one":
+            candidates = candidates & ~pd.Index(bank_fps).isin(final["bank_fp"].dropna())
+        window = bank[candidates]
+        window_fps = bank_fps[candidates]
+
+        if match_cfg["mode"] == "one_to_one":
+            result = match_balances_one_to_one(pending, window, match_cfg["tol_days"], match_cfg["tol_amt"],
+                                               with_bank_row=True, **match_kwargs)
+        else:
+            result = match_balances(pending, window, match_cfg["tol_days"], match_cfg["tol_amt"],
+                                    with_bank_row=True, **match_kwargs)
+        hit = result["_bank_row"].to_numpy()
+        matched_fps = np.where(hit >= 0, window_fps[np.maximum(hit, 0)] if len(window_fps) else None, None)
+        state.save_matches(account, book_fps[~done], matched_fps, result)
+        for col in MATCH_COLUMNS:
+            out.loc[~done, col] = result[col].to_numpy()
+
+    state.set_watermark(
+        account,
+        bank_rows=len(bank),
+        bank_last_fp=chrono_fps[-1] if len(chrono_fps) else None,
+        book_rows=len(corp),
+    )
+    print(f"♻️ 账户 {account}：复用 {int(done.sum())} 行已匹配结果，处理 {len(pending)} 行"
+          f"（银行新增 {len(bank) - seen_bank_rows} 行）")
+
+    out["匹配日期"] = pd.to_datetime(out["匹配日期"])
+    out["银行金额"] = out["银行金额"].astype(float)
+    out["金额差额"] = out["金额差额"].astype(float)
+    return out, pd.Series(~done, index=corp.index)
@@ -0,0 +1,138 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# ============================
+# 金额 / 日期解析（公司账与银行流水共用）
+# ============================
+# 金额：一次 translate 去掉千分位、空格、货币符号并统一减号，再用一个编译好的
+# 正则识别 "(1,234.00)" 这类括号负数；"-"、"--"、"—" 等视为空白。
+# 只对去重后的取值解析一次，再按编码映射回整列，重复金额越多越快。
+# 日期：每次调用只在样本上推断一次格式，之后整列按固定 format 解析。
+
+_AMOUNT_TABLE = str.maketrans({
+    ",": None, "，": None, " ": None, "　": None, "\xa0": None,
+    "¥": None, "￥": None, "元": None,
+    "－": "-", "−": "-", "—": "-", "–": "-",
+    "（": "(", "）": ")",
+})
+_AMOUNT_RE = re.compile(r"^(?P<open>\()?(?P<sign>[+-])?(?P<num>\d*\.?\d+)(?(open)\))$")
+_BLANKS = {"", "-", "--", "---", "nan", "NaN", "None", "null"}
+
+
+def _parse_amount(text):
+    """单个取值 → float；空白返回 nan，无法识别返回 None"""
+    text = text.translate(_AMOUNT_TABLE)
+    if text in _BLANKS:
+        return np.nan
+    m = _AMOUNT_RE.match(text)
+    if m is None:
+        return None
+    value = float(m.group("num"))
+    negative = (m.group("sign") == "-") != bool(m.group("open"))
+    return -value if negative else value
+
+
+def parse_amounts(values, blank=np.nan):
+    """金额列 → float64 Series。
+
+    支持千分位、全角/长减号、括号负数、货币符号；空白及 "-" 取 blank。
+    无法识别的取值（如 "12-"、"1.2.3"）始终记为 NaN，不会被 blank 当成 0 吞掉。
+    """
+    series = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return series.astype("float64").fillna(blank)
+
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    parsed = np.empty(len(uniques), dtype="float64")
+    for i, value in enumerate(uniques):
+        if isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, bool):
+            parsed[i] = blank if np.isnan(value) else float(value)
+            continue
+        result = _parse_amount(str(value))
+        if result is None:
+            parsed[i] = np.nan
+        else:
+            parsed[i] = blank if np.isnan(result) else result
+    out = np.where(codes >= 0, parsed[np.maximum(codes, 0)], blank)
+    return pd.Series(out, index=series.index, dtype="float64")
+
+
+# -----------------------------
+# 日期
+# -----------------------------
+_DATE_FORMATS_DAYFIRST = ["%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%m/%d/%Y", "%m-%d-%Y"]
+_DATE_FORMATS_MONTHFIRST = ["%m/%d/%Y", "%m-%d-%Y", "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y"]
+_DATE_FORMATS_ISO = [
+    "%Y-%m-%d", "%Y/%m/%d", "%Y.%m.%d", "%Y%m%d",
+    "%Y-%m-%d %H:%M:%S", "%Y/%m/%d %H:%M:%S", "%Y-%m-%d %H:%M",
+]
+_DATE_NOISE_RE = re.compile(r"[^0-9/.:\- ]")
+
+
+def _clean_dates(series):
+    """去掉 “2025年07月01日”“ 2025-07-01\t” 这类杂字符；年月日分隔符统一为 -"""
+    text = series.astype("string").str.strip()
+    text = text.str.replace(r"(\d)年(\d)", r"\1-\2", regex=True).str.replace(r"(\d)月(\d)", r"\1-\2", regex=True)
+    return text.str.replace(_DATE_NOISE_RE, "", regex=True).str.strip()
+
+
+def infer_date_format(samples, dayfirst=False):
+    """在样本上逐个尝试候选格式，返回能解析全部样本的第一个格式，否则 None"""
+    candidates = _DATE_FORMATS_ISO + (_DATE_FORMATS_DAYFIRST if dayfirst else _DATE_FORMATS_MONTHFIRST)
+    for fmt in candidates:
+        parsed = pd.to_datetime(samples, format=fmt, errors="coerce")
+        if parsed.notna().all():
+            return fmt
+    return None
+
+
+def _parse_mixed(text, dayfirst):
+    """逐值解析：先试年在前的格式（含清洗后的“2025年07月02日”），其余才按 dayfirst 通用解析，
+    免得 2025-07-02 在 dayfirst 下被读成 2 月 7 日"""
+    parsed = pd.Series(pd.NaT, index=text.index, dtype="datetime64[ns]")
+    for fmt in _DATE_FORMATS_ISO:
+        rest = parsed.isna()
+        if not rest.any():
+            return parsed
+        parsed[rest] = pd.to_datetime(text[rest], format=fmt, errors="coerce")
+    rest = parsed.isna() & text.notna() & (text != "")
+    if rest.any():
+        parsed[rest] = pd.to_datetime(text[rest], errors="coerce", dayfirst=dayfirst, format="mixed")
+    return parsed
+
+
+def parse_dates(values, dayfirst=False, sample_size=200):
+    """日期列 → datetime64 Series，只解析一次。
+
+    已是日期类型直接返回；数值视为 Excel 序列号；文本先清洗，再按样本上推断的格式解析
+    （每次调用推断一次，不跨文件沿用）。与推断格式不符的取值退回逐值解析。
+    """
+    series = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    if pd.api.types.is_numeric_dtype(series):
+        return pd.to_datetime(series, unit="D", origin="1899-12-30", errors="coerce")
+
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    if len(uniques) == 0:
+        return pd.Series(pd.NaT, index=series.index, dtype="datetime64[ns]")
+    text = _clean_dates(pd.Series(uniques, dtype=object))
+    present = text[text.notna() & (text != "")]
+    if present.empty:
+        return pd.Series(pd.NaT, index=series.index, dtype="datetime64[ns]")
+
+    fmt = infer_date_format(present.iloc[:sample_size], dayfirst)
+    if fmt is not None:
+        parsed = pd.to_datetime(text, format=fmt, errors="coerce")
+        # 少数取值与推断格式不符（混合格式）时，仅对这部分逐值解析
+        rest = parsed.isna() & text.notna() & (text != "")
+        if rest.any():
+            parsed[rest] = _parse_mixed(text[rest], dayfirst)
+    else:
+        parsed = _parse_mixed(text, dayfirst)
+
+    parsed = parsed.to_numpy(dtype="datetime64[ns]")
+    out = np.where(codes >= 0, parsed[np.maximum(codes, 0)], np.datetime64("NaT"))
+    return pd.Series(out, index=series.index, dtype="datetime64[ns]")
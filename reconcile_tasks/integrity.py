@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+# ============================
+# 余额连续性校验：账面记录的余额 / 累计 是否等于 期初 + 逐行发生额累加
+# ============================
+# 一次 cumsum 得到推算余额，残差 = 记录值 − 推算值。
+# 断点：本行记录值的变动 ≠ 本行发生额（漏记、重记、改错余额的那一行）；
+# 首个偏离行：残差第一次超出容差的行。二者都是 O(n) 向量运算，不需要逐行匹配银行流水。
+
+
+def running_balance_check(flow, recorded, opening=None, tol=0.01):
+    """校验一列滚动余额。
+
+    flow 为每行发生额（收入为正），recorded 为账面记录的滚动余额；opening 缺省时
+    取 recorded[0] − flow[0]。recorded 为空的行不参与断点判断，推算余额照常累加。
+    返回与输入同索引的 DataFrame：推算值、残差、是否断点。
+    """
+    flow = pd.Series(flow, dtype="float64")
+    recorded = pd.Series(np.asarray(recorded, dtype="float64"), index=flow.index)
+    f = flow.fillna(0.0).to_numpy()
+    r = recorded.to_numpy()
+    if opening is None:
+        first = np.flatnonzero(~np.isnan(r))
+        opening = r[first[0]] - f[: first[0] + 1].sum() if len(first) else 0.0
+
+    expected = opening + np.cumsum(f)
+    residual = r - expected
+
+    # 与上一条有记录的行比较，避免空白行把断点错位
+    known = ~np.isnan(r)
+    prev_r = pd.Series(np.where(known, r, np.nan)).ffill().shift(1).to_numpy()
+    prev_cum = pd.Series(np.where(known, np.cumsum(f), np.nan)).ffill().shift(1).to_numpy()
+    step_err = (r - prev_r) - (np.cumsum(f) - prev_cum)
+    step_err[0] = residual[0]
+    is_break = known & ~np.isnan(step_err) & (np.abs(step_err) > tol)
+
+    return pd.DataFrame({
+        "推算值": expected,
+        "残差": residual,
+        "断点": is_break,
+    }, index=flow.index)
+
+
+def first_divergence(check, tol=0.01):
+    """返回残差首次超出容差的行标签，全部一致时返回 None"""
+    bad = np.abs(check["残差"].to_numpy()) > tol
+    if not bad.any():
+        return None
+    return _label(check.index[int(np.argmax(bad))])
+
+
+def describe(check, tol=0.01):
+    """单列校验摘要：断点数、首个断点、首个偏离行、期末残差"""
+    breaks = check.index[check["断点"].to_numpy()]
+    residual = check["残差"].dropna()
+    return {
+        "断点数": len(breaks),
+        "首个断点": _label(breaks[0]) if len(breaks) else None,
+        "首个偏离行": first_divergence(check, tol),
+        "期末残差": float(residual.iloc[-1]) if len(residual) else 0.0,
+    }
+
+
+def check_corp(corp, tol=0.01):
+    """公司账：余额 vs 期初+累计净额；收入/支出 累计 vs 逐行收入/支出累加。
+
+    返回 (每行标记 Series “余额校验”，{列名: 摘要})。标记为 “断点” / “偏离” / “”。
+    """
+    checks = {"余额": running_balance_check(corp["net"], corp["corp_balance"], tol=tol)}
+    if "income_cum" in corp and corp["income_cum"].notna().any():
+        checks["累计(收入)"] = running_balance_check(corp["income"], corp["income_cum"], opening=0.0, tol=tol)
+    if "expense_cum" in corp and corp["expense_cum"].notna().any():
+        checks["累计(支出)"] = running_balance_check(corp["expense"], corp["expense_cum"], opening=0.0, tol=tol)
+    return _flags(checks, corp.index, tol), {name: describe(c, tol) for name, c in checks.items()}
+
+
+def is_newest_first(bank, tol=0.01):
+    """银行流水是否按时间倒序导出：倒序累加的余额断点更少；断点数相同时看首尾日期"""
+    forward = running_balance_check(bank["net"], bank["bank_balance"], tol=tol)["断点"].sum()
+    reverse = running_balance_check(bank["net"].iloc[::-1], bank["bank_balance"].iloc[::-1], tol=tol)["断点"].sum()
+    if reverse != forward:
+        return bool(reverse < forward)
+    dates = bank["date"].dropna()
+    return bool(len(dates) > 1 and dates.iloc[0] > dates.iloc[-1])
+
+
+def check_bank(bank, tol=0.01):
+    """银行流水：余额 vs 期初+累计(贷方−借方)。
+
+    有的银行按时间倒序导出，此时按倒序校验（摘要中的“首个”按时间先后计）。
+    """
+    flow, balance = bank["net"], bank["bank_balance"]
+    if is_newest_first(bank, tol):
+        flow, balance = flow.iloc[::-1], balance.iloc[::-1]
+    check = running_balance_check(flow, balance, tol=tol)
+    return _flags({"余额": check}, bank.index, tol), {"余额": describe(check, tol)}
+
+
+def _label(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _flags(checks, index, tol):
+    flags = pd.Series("", index=index, name="余额校验", dtype=object)
+    for check in checks.values():
+        drift = (np.abs(check["残差"]) > tol).reindex(index, fill_value=False)
+        flags[drift & (flags == "")] = "偏离"
+    for check in checks.values():
+        flags[check["断点"].reindex(index, fill_value=False)] = "断点"
+    return flags
@@ -0,0 +1,246 @@
+import numpy as np
+import pandas as pd
+
+from text_index import make_pair_scorer, prune_by_text
+
+# 对账输出列（与原 match_balance 的返回顺序一致）
+MATCH_COLUMNS = ["匹配日期", "银行交易类型", "银行金额", "金额差额", "匹配状态"]
+
+_NS_PER_DAY = 86_400 * 10**9
+
+
+def _to_ns(dates):
+    """日期列 → int64 纳秒（NaT 保留为 NaT 对应的最小值，由调用方先剔除）"""
+    return pd.to_datetime(dates).values.astype("datetime64[ns]").view("int64")
+
+
+def window_bounds(corp_dates, bank_dates_sorted, tol_days):
+    """对每条公司账，用二分查找求出 ±tol_days 窗口在已排序银行日期中的 [lo, hi) 区间"""
+    tol = tol_days * _NS_PER_DAY
+    lo = np.searchsorted(bank_dates_sorted, corp_dates - tol, side="left")
+    hi = np.searchsorted(bank_dates_sorted, corp_dates + tol, side="right")
+    return lo, hi
+
+
+def iter_candidate_pairs(lo, hi, max_pairs=2_000_000):
+    """把每行的 [lo, hi) 区间展开成 (公司账行号, 银行行号) 候选对；按块产出以控制内存"""
+    counts = hi - lo
+    ends = np.cumsum(counts)
+    n = len(lo)
+    start = 0
+    while start < n:
+        base = ends[start - 1] if start else 0
+        stop = max(start + 1, int(np.searchsorted(ends, base + max_pairs, side="right")))
+        c = counts[start:stop]
+        rows = np.repeat(np.arange(start, stop), c)
+        offsets = np.arange(c.sum()) - np.repeat(np.cumsum(c) - c, c)
+        cols = np.repeat(lo[start:stop], c) + offsets
+        yield rows, cols
+        start = stop
+
+
+def prepare_bank(bank):
+    """剔除无日期的银行记录并按日期稳定排序，返回 (排序后的银行表, 排序后的日期 ns)"""
+    has_date = bank["date"].notna().to_numpy()
+    valid = bank[has_date].copy()
+    valid["_orig_pos"] = np.flatnonzero(has_date)
+    valid = valid.sort_values("date", kind="mergesort")
+    return valid, _to_ns(valid["date"])
+
+
+def match_balances(corp, bank_df, tol_days=3, tol_amt=50.0, max_pairs=2_000_000, with_bank_row=False,
+                   text_cols=None, min_text_score=0.2):
+    """批量版余额匹配：日期窗口内取银行余额最接近公司账余额的一笔。
+
+    结果与逐行 match_balance 完全一致（并列时取银行表中靠前的一笔），
+    但用排序 + 二分 + 向量化 argmin 代替每行一次全表过滤。
+    返回与 corp 同索引、列为 MATCH_COLUMNS 的 DataFrame；with_bank_row=True 时
+    另附 "_bank_row" 列（命中的银行记录在 bank_df 中的位置，未命中为 -1）。
+
+    text_cols=(公司账文本列, 银行文本列) 时启用文本相似度（见 text_index.py）：容差内
+    有多个候选时按 min_text_score 剪掉文本不符的，再取文本最相似的一笔，
+    同一天余额相近的两笔转账因此能按摘要区分开；容差外仍取余额最接近的一笔。
+    """
+    bank_sorted, bank_ns = prepare_bank(bank_df)
+    bank_balance = bank_sorted["bank_balance"].to_numpy(dtype=float)
+    bank_order = bank_sorted["_orig_pos"].to_numpy()
+
+    has_date = corp["date"].notna().to_numpy()
+    corp_pos = np.flatnonzero(has_date)
+    corp_ns = _to_ns(corp["date"])[corp_pos]
+    corp_balance = corp["corp_balance"].to_numpy(dtype=float)[corp_pos]
+
+    scorer = None if text_cols is None else make_pair_scorer(corp, bank_df, *text_cols)
+
+    lo, hi = window_bounds(corp_ns, bank_ns, tol_days)
+    best = np.full(len(corp_pos), -1)
+    for rows, cols in iter_candidate_pairs(lo, hi, max_pairs):
+        diff = np.abs(bank_balance[cols] - corp_balance[rows])
+        if scorer is None:
+            # 先按公司账行、再按差额、最后按银行原始顺序排序，每组第一条即 idxmin
+            order = np.lexsort((bank_order[cols], diff, rows))
+        else:
+            score = scorer(corp_pos[rows], bank_order[cols])
+            keep = prune_by_text(rows, score, len(corp_pos), min_text_score, eligible=diff <= tol_amt)
+            rows, cols, diff, score = rows[keep], cols[keep], diff[keep], score[keep]
+            outside = diff > tol_amt
+            text_rank = np.where(outside, 0.0, -np.round(score, 6))
+            order = np.lexsort((bank_order[cols], diff, text_rank, outside, rows))
+        rows_sorted = rows[order]
+        first = np.r_[True, rows_sorted[1:] != rows_sorted[:-1]]
+        best[rows_sorted[first]] = cols[order][first]
+
+    n = len(corp)
+    out = pd.DataFrame({
+        "匹配日期": pd.Series(pd.NaT, index=range(n), dtype="datetime64[ns]"),
+        "银行交易类型": pd.Series([None] * n, dtype=object),
+        "银行金额": np.nan,
+        "金额差额": np.nan,
+        "匹配状态": np.where(has_date, "银行无数据", "跳过").astype(object),
+    })
+
+    found = best >= 0
+    hit_rows = corp_pos[found]
+    hit_bank = bank_sorted.iloc[best[found]]
+    diff = np.abs(hit_bank["bank_balance"].to_numpy(dtype=float) - corp_balance[found])
+    out.loc[hit_rows, "匹配日期"] = hit_bank["date"].to_numpy()
+    out.loc[hit_rows, "银行交易类型"] = hit_bank["type"].to_numpy()
+    out.loc[hit_rows, "银行金额"] = hit_bank["bank_balance"].to_numpy(dtype=float)
+    out.loc[hit_rows, "金额差额"] = diff
+    out.loc[hit_rows, "匹配状态"] = np.where(diff <= tol_amt, "正常", "余额异常")
+    if with_bank_row:
+        out["_bank_row"] = -1
+        out.loc[hit_rows, "_bank_row"] = hit_bank["_orig_pos"].to_numpy()
+    out.index = corp.index
+    return out
+
+
+# -----------------------------
+# 一对一最优匹配（每笔银行记录最多被一行公司账占用）
+# -----------------------------
+def candidate_edges(corp, bank_df, tol_days=3, tol_amt=50.0, max_pairs=2_000_000, text_cols=None,
+                    min_text_score=0.2):
+    """稀疏候选图：只保留日期窗口内且余额差不超过 tol_amt 的 (公司账, 银行) 对。
+
+    返回 (corp_rows, bank_rows, cost, bank_sorted)，行号分别是 corp 的位置和
+    bank_sorted 的位置；cost 为差额与日期差各自按容差归一化后的和，
+    启用文本时再加上 1 − 文本相似度，并按 min_text_score 剪枝。
+    """
+    bank_sorted, bank_ns = prepare_bank(bank_df)
+    bank_balance = bank_sorted["bank_balance"].to_numpy(dtype=float)
+
+    corp_pos = np.flatnonzero(corp["date"].notna().to_numpy())
+    corp_ns = _to_ns(corp["date"])[corp_pos]
+    corp_balance = corp["corp_balance"].to_numpy(dtype=float)[corp_pos]
+
+    scorer = None if text_cols is None else make_pair_scorer(corp, bank_df, *text_cols)
+    bank_order = bank_sorted["_orig_pos"].to_numpy()
+
+    lo, hi = window_bounds(corp_ns, bank_ns, tol_days)
+    edges = []
+    for rows, cols in iter_candidate_pairs(lo, hi, max_pairs):
+        diff = np.abs(bank_balance[cols] - corp_balance[rows])
+        keep = diff <= tol_amt
+        rows, cols, diff = rows[keep], cols[keep], diff[keep]
+        days = np.abs(bank_ns[cols] - corp_ns[rows]) / _NS_PER_DAY
+        cost = diff / max(tol_amt, 1e-9) + days / (tol_days + 1)
+        if scorer is not None:
+            score = scorer(corp_pos[rows], bank_order[cols])
+            keep = prune_by_text(rows, score, len(corp_pos), min_text_score)
+            rows, cols, cost = rows[keep], cols[keep], cost[keep] + 1.0 - score[keep]
+        edges.append((corp_pos[rows], cols, cost))
+
+    if not edges:
+        empty = np.array([], dtype=int)
+        return empty, empty, np.array([]), bank_sorted
+    corp_rows, bank_rows, cost = (np.concatenate(parts) for parts in zip(*edges))
+    return corp_rows, bank_rows, cost, bank_sorted
+
+
+def _solve_component(args):
+    """在一个连通分量内求最小代价一对一匹配；无边的位置用大代价占位后剔除"""
+    from scipy.optimize import linear_sum_assignment
+
+    corp_ids, bank_ids, rows, cols, cost = args
+    big = cost.sum() + 1.0
+    matrix = np.full((len(corp_ids), len(bank_ids)), big)
+    matrix[rows, cols] = cost
+    r, c = linear_sum_assignment(matrix)
+    real = matrix[r, c] < big
+    return corp_ids[r[real]], bank_ids[c[real]]
+
+
+def assign_one_to_one(corp_rows, bank_rows, cost, n_jobs=None, parallel_threshold=64):
+    """按连通分量拆分稀疏候选图并求解；大分量放进进程池并行。
+
+    返回 {公司账位置: bank_sorted 位置}。
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    if len(corp_rows) == 0:
+        return {}
+    corp_ids, corp_local = np.unique(corp_rows, return_inverse=True)
+    bank_ids, bank_local = np.unique(bank_rows, return_inverse=True)
+    n_c, n_b = len(corp_ids), len(bank_ids)
+
+    # 公司账节点 0..n_c-1，银行节点 n_c..n_c+n_b-1
+    graph = coo_matrix((np.ones(len(cost)), (corp_local, bank_local + n_c)), shape=(n_c + n_b, n_c + n_b))
+    _, labels = connected_components(graph, directed=False)
+    edge_label = labels[corp_local]
+
+    order = np.argsort(edge_label, kind="mergesort")
+    splits = np.flatnonzero(np.diff(edge_label[order])) + 1
+    small, large = [], []
+    for idx in np.split(order, splits):
+        c_loc, c_inv = np.unique(corp_local[idx], return_inverse=True)
+        b_loc, b_inv = np.unique(bank_local[idx], return_inverse=True)
+        task = (corp_ids[c_loc], bank_ids[b_loc], c_inv, b_inv, cost[idx])
+        (large if len(c_loc) * len(b_loc) >= parallel_threshold else small).append(task)
+
+    results = [_solve_component(task) for task in small]
+    if large:
+        if n_jobs == 1 or len(large) == 1:
+            results += [_solve_component(task) for task in large]
+        else:
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                results += list(executor.map(_solve_component, large, chunksize=4))
+
+    assignment = {}
+    for c_ids, b_ids in results:
+        assignment.update(zip(c_ids.tolist(), b_ids.tolist()))
+    return assignment
+
+
+def match_balances_one_to_one(corp, bank_df, tol_days=3, tol_amt=50.0, n_jobs=None, with_bank_row=False,
+                              text_cols=None, min_text_score=0.2):
+    """一对一模式：每笔银行记录至多匹配一行公司账，总代价最小。
+
+    未分到银行记录的行沿用最接近余额的结果；若它本来在容差内、只是对应银行
+    记录已被其他行占用，则标记为“重复占用”，以暴露被多行争抢掩盖的差异。
+    """
+    out = match_balances(corp, bank_df, tol_days=tol_days, tol_amt=tol_amt, with_bank_row=with_bank_row,
+                         text_cols=text_cols, min_text_score=min_text_score)
+    corp_rows, bank_rows, cost, bank_sorted = candidate_edges(corp, bank_df, tol_days, tol_amt, text_cols=text_cols,
+                                                              min_text_score=min_text_score)
+    assignment = assign_one_to_one(corp_rows, bank_rows, cost, n_jobs=n_jobs)
+
+    assigned = np.zeros(len(corp), dtype=bool)
+    if assignment:
+        pos = np.fromiter(assignment.keys(), dtype=int)
+        hit_bank = bank_sorted.iloc[np.fromiter(assignment.values(), dtype=int)]
+        corp_balance = corp["corp_balance"].to_numpy(dtype=float)[pos]
+        labels = corp.index[pos]
+        out.loc[labels, "匹配日期"] = hit_bank["date"].to_numpy()
+        out.loc[labels, "银行交易类型"] = hit_bank["type"].to_numpy()
+        out.loc[labels, "银行金额"] = hit_bank["bank_balance"].to_numpy(dtype=float)
+        out.loc[labels, "金额差额"] = np.abs(hit_bank["bank_balance"].to_numpy(dtype=float) - corp_balance)
+        out.loc[labels, "匹配状态"] = "正常"
+        if with_bank_row:
+            out.loc[labels, "_bank_row"] = hit_bank["_orig_pos"].to_numpy()
+        assigned[pos] = True
+
+    contested = (~assigned) & (out["匹配状态"] == "正常").to_numpy()
+    out.loc[contested, "匹配状态"] = "重复占用"
+    return out
@@ -1,178 +1,244 @@
+import json
+import os
 import pandas as pd
-from datetime import timedelta
-from openpyxl import load_workbook
-from openpyxl.styles import PatternFill, Font, Alignment
+from excel_writer import write_reconciled
+from ingest import parse_amounts, parse_dates
+from incremental import ReconcileState, match_incremental
+from integrity import check_bank, check_corp
+from matching import MATCH_COLUMNS, match_balances, match_balances_one_to_one
+from split_match import match_split_transactions
+from transfers import TRANSFER_COLUMNS, link_book_transfers, load_statements, match_transfers
 
 # ============================
-# 1️⃣ 读取原始文件
+# 0️⃣ 列映射与参数：唯一的默认配置。JSON/YAML 配置文件只需写要改的节和键，
+#    按节覆盖，例如 {"match": {"mode": "one_to_one"}, "bank": {"dayfirst": true}}
 # ============================
-# 把你的两张表保存为 Excel 或 CSV 文件
-# 例如：company_book.xlsx / bank_statement.xlsx
-corp = pd.read_csv("corp_07.csv")  # 图一
-bank = pd.read_csv("bank.csv")  # 图二
+DEFAULT_PROFILE = {
+    "corp": {
+        "rename": {"日期": "date", "明细摘要": "summary", "打款单位": "payer", "余额": "corp_balance"},
+        # 收入字段（左侧）← 注意：这些列名必须与Excel完全一致
+        "income_cols": ["豪爵车款", "配件款", "广宣及装修款", "转存", "其他"],
+        # 支出字段（右侧）Excel中第二个“其他”通常会变成 “其他.1”
+        # 转存、保证金、还敞口 也从余额中扣除，漏掉它会让余额校验在每笔转存处断开
+        "expense_cols": ["付工厂货款", "广宣及装修品", "公司费用", "财务费用", "转存、保证金、还敞口", "其他.1"],
+        # 账面自带的收入/支出滚动累计列，用于余额连续性校验
+        "running_cols": {"income": "累计", "expense": "累计.1"},
+        # 与银行文本比对的列（字符 n-gram 相似度）
+        "text_cols": ["summary", "payer"],
+        # 内部转账列：转入 / 转出，用于与多账户流水中的转账两条腿挂接
+        "transfer_cols": {"in": ["转存"], "out": ["转存、保证金、还敞口"]},
+        "dayfirst": True
+    },
+    "bank": {
+        "rename": {"起息日": "date", "交易类型": "type", "借方金额": "debit", "贷方金额": "credit", "余额": "bank_balance"},
+        # 有则带上的列：不同银行导出的对方户名列名不一
+        "optional_rename": {"对方户名": "counterparty", "对方账户名称": "counterparty", "对方单位": "counterparty"},
+        "text_cols": ["type", "counterparty"],
+        "dayfirst": False
+    },
+    "match": {"mode": "closest", "tol_days": 3, "tol_amt": 50.0, "use_text": True, "min_text_score": 0.2},
+    # 拆分匹配默认关闭：合成数据基准上精确率尚不达标，需按账户核实后再开
+    "split": {"enabled": False, "tol_days": 3, "tol_amt": 0.01, "max_group": 5, "max_candidates": 16},
+    "integrity": {"enabled": True, "tol": 0.01},
+    "transfer": {"tol_days": 1}
+}
+
+
+def load_profile(path=None):
+    """读取列映射配置（.json / .yaml / .yml），按节覆盖默认配置"""
+    profile = json.loads(json.dumps(DEFAULT_PROFILE))
+    if path is None:
+        return profile
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            import yaml
+            custom = yaml.safe_load(f) or {}
+        else:
+            custom = json.load(f)
+    for section, values in custom.items():
+        profile.setdefault(section, {}).update(values)
+    return profile
+
+
+def _read_table(path):
+    if path.endswith((".xlsx", ".xls")):
+        return pd.read_excel(path)
+    if path.endswith(".parquet"):  # convert.py 的输出，类型已推断好
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
 
 
 # ============================
-# 2️⃣ 字段标准化（根据真实表头）
+# 1️⃣ 读取原始文件 + 2️⃣ 字段标准化（根据真实表头）
 # ============================
-corp = corp.rename(columns={
-    "日期": "date",
-    "明细摘要": "summary",
-    "余额": "corp_balance"
-})
-
-corp = corp[corp["summary"].isnull() == False]
-
-# 收入字段（左侧）
-income_cols = ["豪爵车款", "配件款", "广宣及装修款", "转存", "其他"]  # ← 注意：这些列名必须与Excel完全一致
-# 支出字段（右侧）
-expense_cols = ["付工厂货款", "广宣及装修品", "公司费用", "财务费用", "其他.1"]  # Excel中第二个“其他”通常会变成 “其他.1”
-
-
-# 汇总计算
-corp["income"] = corp[income_cols].sum(axis=1, numeric_only=True)
-corp["expense"] = corp[expense_cols].sum(axis=1, numeric_only=True)
-corp["net"] = corp["income"].fillna(0) - corp["expense"].fillna(0)
-
-bank = bank[["起息日", "交易类型", "借方金额", "贷方金额", "余额"]]
-bank = bank.rename(columns={
-    "起息日": "date",
-    "交易类型": "type",
-    "借方金额": "debit",
-    "贷方金额": "credit",
-    "余额": "bank_balance"
-})
-
-for col in ["debit", "credit"]:
-    bank[col] = (
-        bank[col]
-        .astype(str)
-        .str.replace(",", "", regex=False)     # 去掉千分位逗号
-        .str.replace(" ", "", regex=False)     # 去掉空格
-        .str.replace("－", "-", regex=False)   # 中文减号 → 英文减号
-        .str.replace("-", "0", regex=False)    # 空白/短横线替换为0
-        .replace("", "0")                     # 空字符串转为0
-    )
-    bank[col] = pd.to_numeric(bank[col], errors="coerce").fillna(0)
-
-# 计算净额：贷方 - 借方
-bank["net"] = bank["credit"] - bank["debit"]
-
-
-# 清洗银行余额字段，转成 float
-bank["bank_balance"] = (
-    bank["bank_balance"]
-    .astype(str)
-    .str.replace(",", "", regex=False)
-    .str.replace(" ", "", regex=False)
-    .replace("-", "0")
-    .replace("", "0")
-)
-bank["bank_balance"] = pd.to_numeric(bank["bank_balance"], errors="coerce").fillna(0.0)
-
-
-
-# 清洗公司账余额字段，转成 float
-corp["corp_balance"] = (
-    corp["corp_balance"]
-    .astype(str)
-    .str.replace(",", "", regex=False)
-    .str.replace(" ", "", regex=False)
-    .replace("-", "0")
-    .replace("", "0")
-)
-corp["corp_balance"] = pd.to_numeric(corp["corp_balance"], errors="coerce").fillna(0.0)
-
-
-corp["date"] = pd.to_datetime(corp["date"], errors="coerce", dayfirst=True)
-bank["date"] = pd.to_datetime(bank["date"], errors="coerce", dayfirst=False)
-
-bank["date"] = (
-    bank["date"]
-    .astype(str)
-    .str.strip()
-    .replace(r"[^0-9/.-]", "", regex=True)
-    .pipe(lambda s: pd.to_datetime(s, errors="coerce"))
-)
-
-corp = corp[['date', 'summary', 'corp_balance', 'income', 'expense', 'net']]
-
-
-bank.columns
-corp.columns
-# -----------------------------
-# 5️⃣ 余额匹配逻辑（比对公司账累计余额与银行余额）
-# -----------------------------
-def match_balance(row, bank_df, tol_days=3, tol_amt=50.0):
-    date = row["date"]
-    if pd.isna(date):
-        return None, None, None, None, "跳过"
-
-    # 找到日期窗口内最近的一笔银行记录
-    mask = (bank_df["date"] >= date - timedelta(days=tol_days)) & \
-           (bank_df["date"] <= date + timedelta(days=tol_days))
-    subset = bank_df.loc[mask].copy()
-    if subset.empty:
-        return None, None, None, None, "银行无数据"
-
-    # 找最接近的余额（银行余额）
-    subset["diff"] = (subset["bank_balance"] - row["corp_balance"]).abs()
-    best = subset.loc[subset["diff"].idxmin()]
-
-    bank_balance = float(best["bank_balance"])
-    diff = abs(bank_balance - row["corp_balance"])
-    status = "正常" if diff <= tol_amt else "余额异常"
-
-    return best["date"], best["type"], bank_balance, diff, status
-
-
-corp[["匹配日期", "银行交易类型", "银行金额", "金额差额", "匹配状态"]] = corp.apply(
-    match_balance,
-    axis=1,
-    result_type="expand",
-    bank_df=bank,
-    tol_days=3,
-    tol_amt=50.0
-)
-
-corp.dtypes
-bank.dtypes
-
-# ============================
-# 4️⃣ 输出 Excel（保留所有原始列 + 新增对账列）
-# ============================
-output = "company_book_reconciled_07.xlsx"
-corp.to_excel(output, index=False)
-
-# ============================
-# 5️⃣ Excel 自动上色（直观显示问题）
-# ============================
-wb = load_workbook(output)
-ws = wb.active
-ws.title = "Reconciled_Book"
-
-green = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-yellow = PatternFill(start_color="FFEB9C", end_color="FFEB9C", fill_type="solid")
-red = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-
-for row in ws.iter_rows(min_row=2, min_col=1, max_col=ws.max_column):
-    status = row[-1].value  # 匹配状态列
-    if status == "正常":
-        fill = green
-    elif status == "金额异常":
-        fill = yellow
-    elif "银行无数据" in str(status) or "方向不符" in str(status):
-        fill = red
+def load_corp(path, profile):
+    corp = _read_table(path)  # 图一
+    cfg = profile["corp"]
+    corp = corp.rename(columns=cfg["rename"])
+
+    corp = corp[corp["summary"].isnull() == False]
+
+    # 汇总计算（金额列可能带千分位或 "-"，先统一解析成数值）
+    amounts = {col: parse_amounts(corp[col]) for col in cfg["income_cols"] + cfg["expense_cols"]}
+    corp["income"] = pd.DataFrame({c: amounts[c] for c in cfg["income_cols"]}).sum(axis=1)
+    corp["expense"] = pd.DataFrame({c: amounts[c] for c in cfg["expense_cols"]}).sum(axis=1)
+    corp["net"] = corp["income"].fillna(0) - corp["expense"].fillna(0)
+    transfer_cols = cfg.get("transfer_cols", {})
+    if transfer_cols:
+        def _total(cols):
+            present = [c for c in cols if c in corp]
+            return sum((amounts[c] if c in amounts else parse_amounts(corp[c])).fillna(0) for c in present) + 0.0
+        corp["transfer"] = _total(transfer_cols.get("in", [])) - _total(transfer_cols.get("out", []))
+
+    # 公司账余额 → float（空白 / "-" 记 0）
+    corp["corp_balance"] = parse_amounts(corp["corp_balance"], blank=0.0)
+    corp["date"] = parse_dates(corp["date"], dayfirst=cfg["dayfirst"])
+
+    # 账面滚动累计（缺列时为空，校验时跳过）
+    for key, col in cfg.get("running_cols", {}).items():
+        corp[f"{key}_cum"] = parse_amounts(corp[col]) if col in corp else float("nan")
+    keep = ['date', 'summary', 'corp_balance', 'income', 'expense', 'net']
+    return corp[keep + [c for c in ("payer", "transfer", "income_cum", "expense_cum") if c in corp]]
+
+
+def load_bank(path, profile):
+    bank = _read_table(path)  # 图二
+    cfg = profile["bank"]
+    optional = {k: v for k, v in cfg.get("optional_rename", {}).items() if k in bank}
+    bank = bank[list(cfg["rename"]) + list(optional)]
+    bank = bank.rename(columns={**cfg["rename"], **optional})
+
+    # 借贷金额、余额 → float：单次解析，负数与括号负数保持原值，空白 / "-" 记 0
+    for col in ["debit", "credit", "bank_balance"]:
+        bank[col] = parse_amounts(bank[col], blank=0.0)
+
+    # 计算净额：贷方 - 借方
+    bank["net"] = bank["credit"] - bank["debit"]
+
+    bank["date"] = parse_dates(bank["date"], dayfirst=cfg["dayfirst"])
+    return bank
+
+
+def reconcile(corp, bank, profile, state=None, account=None):
+    """余额匹配 + 拆分交易匹配，返回 (带对账列的公司账, 拆分组明细)。
+
+    传入 state（incremental.ReconcileState）时按账户增量匹配：只处理新增及上次未匹配成功的行，
+    拆分交易匹配也只在这些行中进行。
+    """
+    corp = corp.copy()
+    # -----------------------------
+    # 5️⃣ 余额匹配逻辑（比对公司账累计余额与银行余额）
+    # -----------------------------
+    # 匹配模式："closest" = 每行各取最接近余额（可能多行占用同一笔银行记录）
+    #           "one_to_one" = 每笔银行记录至多匹配一行，全局最小代价
+    m = profile["match"]
+    # 排序 + 二分窗口 + 向量化 argmin，代替逐行 apply（结果列与原逐行版本一致）
+    # 文本相似度（明细摘要/打款单位 vs 交易类型/对方户名）用于剪枝候选、区分同日相近余额
+    text = {}
+    if m.get("use_text", False):
+        text = {"text_cols": (profile["corp"]["text_cols"], profile["bank"]["text_cols"]),
+                "min_text_score": m["min_text_score"]}
+    pending = None
+    if state is not None:
+        corp[MATCH_COLUMNS], pending = match_incremental(corp, bank, m, state, account, **text)
+    elif m["mode"] == "one_to_one":
+        corp[MATCH_COLUMNS] = match_balances_one_to_one(corp, bank, tol_days=m["tol_days"], tol_amt=m["tol_amt"], **text)
     else:
-        fill = None
-    if fill:
-        for cell in row:
-            cell.fill = fill
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-
-wb.save(output)
-print(f"✅ 对账结果已生成：{output}")
-print("输出说明：")
-print(" - 绿色：金额完全匹配")
-print(" - 黄色：金额差额超出容差")
-print(" - 红色：银行无对应记录或方向不符")
\ No newline at end of file
+        corp[MATCH_COLUMNS] = match_balances(corp, bank, tol_days=m["tol_days"], tol_amt=m["tol_amt"], **text)
+
+    # -----------------------------
+    # 6️⃣ 拆分交易匹配（一笔银行流水 ↔ 多行公司账，或反之），基于 net 金额
+    # -----------------------------
+    split_groups = pd.DataFrame()
+    sp = profile["split"]
+    if sp["enabled"]:
+        split_groups, split_ids = match_split_transactions(
+            corp if pending is None else corp[pending], bank, tol_days=sp["tol_days"], tol_amt=sp["tol_amt"], max_group=sp["max_group"],
+            max_candidates=sp["max_candidates"]
+        )
+        corp.insert(corp.columns.get_loc("匹配日期"), "拆分组号", split_ids.reindex(corp.index))
+
+    # -----------------------------
+    # 7️⃣ 余额连续性校验（记录余额/累计 vs 期初 + 逐行发生额累加）
+    # -----------------------------
+    if profile.get("integrity", {}).get("enabled", False):
+        flags, _ = check_corp(corp, tol=profile["integrity"]["tol"])
+        corp["余额校验"] = flags
+    return corp, split_groups
+
+
+def summarize(corp, split_groups, period):
+    """单期汇总：各匹配状态行数 + 拆分组数"""
+    summary = {"期间": period, "公司账行数": len(corp)}
+    summary.update(corp["匹配状态"].value_counts().to_dict())
+    summary["拆分组数"] = len(split_groups)
+    if "转账组号" in corp:
+        summary["内部转账行数"] = int(corp["转账组号"].notna().sum())
+    if "余额校验" in corp:
+        summary["余额断点数"] = int((corp["余额校验"] == "断点").sum())
+    return summary
+
+
+def write_output(corp, output):
+    # ============================
+    # 4️⃣ 输出 Excel（保留所有原始列 + 新增对账列），一次写出
+    # 5️⃣ 按匹配状态整行着色（条件格式，不再逐格填色）
+    # ============================
+    write_reconciled(corp, output, status_col="匹配状态", sheet_title="Reconciled_Book")
+    print(f"✅ 对账结果已生成：{output}")
+
+
+def reconcile_period(book_path, bank_path, profile, output, split_output=None, period=None,
+                     state_path=None, account=None, other_banks=None, transfer_output=None):
+    """对一期（一对公司账/银行流水文件）完成读取、匹配与输出，返回汇总字典。
+
+    给出 state_path 时启用增量对账；account 缺省取银行流水文件名。
+    other_banks 为公司其它账户的同期流水：与本账户流水一起做跨账户内部转账配对，
+    公司账的转存行挂到对应转账组上（“转账组号”列），配对明细写到 transfer_output。
+    """
+    corp = load_corp(book_path, profile)
+    bank = load_bank(bank_path, profile)
+    if profile.get("integrity", {}).get("enabled", False):
+        _, bank_checks = check_bank(bank, tol=profile["integrity"]["tol"])
+        _, corp_checks = check_corp(corp, tol=profile["integrity"]["tol"])
+        for source, checks in (("公司账", corp_checks), ("银行流水", bank_checks)):
+            for name, info in checks.items():
+                if info["断点数"]:
+                    print(f"⚠️ {source}{name}：{info['断点数']} 处断点，首个断点行 {info['首个断点']}，"
+                          f"首个偏离行 {info['首个偏离行']}，期末残差 {info['期末残差']:,.2f}")
+    if state_path:
+        with ReconcileState(state_path) as state:
+            account = account or os.path.splitext(os.path.basename(bank_path))[0]
+            corp, split_groups = reconcile(corp, bank, profile, state=state, account=account)
+    else:
+        corp, split_groups = reconcile(corp, bank, profile)
+    print(f"🔗 拆分交易匹配：{len(split_groups)} 组")
+    if other_banks:
+        banks = load_statements([bank_path] + list(other_banks), load_bank, profile)
+        transfers, _ = match_transfers(banks, tol_days=profile["transfer"]["tol_days"])
+        own = os.path.splitext(os.path.basename(bank_path))[0]
+        corp["转账组号"] = link_book_transfers(corp, transfers, own, tol_days=profile["transfer"]["tol_days"])
+        print(f"🔁 跨账户内部转账：{len(transfers)} 组，公司账挂接 {int(corp['转账组号'].notna().sum())} 行")
+        if transfer_output:
+            transfers[TRANSFER_COLUMNS].to_csv(transfer_output, index=False)
+    if split_output:
+        split_groups.to_csv(split_output, index=False)
+    write_output(corp, output)
+    return summarize(corp, split_groups, period or os.path.basename(book_path))
+
+
+if __name__ == "__main__":
+    # 把你的两张表保存为 Excel 或 CSV 文件
+    # 例如：company_book.xlsx / bank_statement.xlsx
+    reconcile_period(
+        "corp_07.csv",
+        "bank.csv",
+        load_profile(),
+        output="company_book_reconciled_07.xlsx",
+        split_output="split_groups_07.csv",
+        period="07"
+    )
+    print("输出说明：")
+    print(" - 绿色：正常（余额在容差内）")
+    print(" - 黄色：余额异常（差额超出容差）")
+    print(" - 红色：银行无数据，或一对一模式下重复占用")
\ No newline at end of file
@@ -0,0 +1,179 @@
+import numpy as np
+import pandas as pd
+
+from matching import _NS_PER_DAY, _to_ns, iter_candidate_pairs
+
+# 候选数不超过该值时用折半枚举（每半 2^12 个子集），否则用带剪枝的深度优先搜索
+MITM_MAX_ITEMS = 24
+
+
+def _to_cents(values):
+    return np.round(np.abs(np.asarray(values, dtype=float)) * 100).astype(np.int64)
+
+
+def _all_subset_sums(values):
+    """枚举 values 的全部子集：返回 (和, 位掩码, 元素个数)"""
+    sums = np.zeros(1, dtype=np.int64)
+    masks = np.zeros(1, dtype=np.int64)
+    sizes = np.zeros(1, dtype=np.int64)
+    for i, v in enumerate(values):
+        sums = np.concatenate([sums, sums + v])
+        masks = np.concatenate([masks, masks | (1 << i)])
+        sizes = np.concatenate([sizes, sizes + 1])
+    return sums, masks, sizes
+
+
+def _mitm_subset(values, target, tol, max_group):
+    """折半查找：左右两半各自枚举子集和，排序后二分找互补的一半"""
+    half = len(values) // 2
+    l_sums, l_masks, l_sizes = _all_subset_sums(values[:half])
+    r_sums, r_masks, r_sizes = _all_subset_sums(values[half:])
+    keep = l_sizes <= max_group
+    l_sums, l_masks, l_sizes = l_sums[keep], l_masks[keep], l_sizes[keep]
+    order = np.argsort(r_sums, kind="mergesort")
+    r_sums, r_masks, r_sizes = r_sums[order], r_masks[order], r_sizes[order]
+
+    lo = np.searchsorted(r_sums, target - tol - l_sums, side="left")
+    hi = np.searchsorted(r_sums, target + tol - l_sums, side="right")
+    best = None
+    for rows, cols in iter_candidate_pairs(lo, hi, max_pairs=200_000):
+        size = l_sizes[rows] + r_sizes[cols]
+        err = np.abs(l_sums[rows] + r_sums[cols] - target)
+        ok = (size >= 1) & (size <= max_group)
+        if not ok.any():
+            continue
+        idx = np.flatnonzero(ok)
+        pick = idx[np.lexsort((err[idx], size[idx]))[0]]
+        candidate = (int(size[pick]), int(err[pick]), int(l_masks[rows[pick]]), int(r_masks[cols[pick]]))
+        if best is None or candidate[:2] < best[:2]:
+            best = candidate
+    if best is None:
+        return None
+    _, _, l_mask, r_mask = best
+    chosen = [i for i in range(half) if l_mask >> i & 1]
+    chosen += [half + i for i in range(len(values) - half) if r_mask >> i & 1]
+    return chosen
+
+
+def _dfs_subset(values, target, tol, max_group, max_nodes=200_000):
+    """大候选集：按金额降序深搜，超出 target+tol 或剩余不足即剪枝，找到最少笔数的组合"""
+    order = np.argsort(-values, kind="mergesort")
+    vals = values[order]
+    suffix = np.concatenate([np.cumsum(vals[::-1])[::-1], [0]])
+    best = None
+    nodes = 0
+    stack = [(0, 0, ())]
+    while stack and nodes < max_nodes:
+        start, total, picked = stack.pop()
+        nodes += 1
+        if picked and abs(total - target) <= tol:
+            if best is None or len(picked) < len(best):
+                best = picked
+            continue
+        if len(picked) >= max_group or (best is not None and len(picked) + 1 >= len(best)):
+            continue
+        for i in range(len(vals) - 1, start - 1, -1):
+            new_total = total + vals[i]
+            if new_total > target + tol or total + suffix[i] < target - tol:
+                continue
+            stack.append((i + 1, new_total, picked + (i,)))
+    if best is None:
+        return None
+    return [int(order[i]) for i in best]
+
+
+def find_subset(values_cents, target_cents, tol_cents, max_group=5):
+    """在同号金额中找一组之和落在 target ± tol 内的组合，返回下标列表或 None"""
+    values = np.asarray(values_cents, dtype=np.int64)
+    # 单笔已超过目标的不可能入选（同号金额只增不减）
+    usable = np.flatnonzero(values <= target_cents + tol_cents)
+    if len(usable) == 0:
+        return None
+    if len(usable) <= MITM_MAX_ITEMS:
+        found = _mitm_subset(values[usable], target_cents, tol_cents, max_group)
+    else:
+        found = _dfs_subset(values[usable], target_cents, tol_cents, max_group)
+    return None if found is None else [int(usable[i]) for i in found]
+
+
+def _prefilter(cents, offset_ns, free, target, tol_cents, max_group, max_candidates):
+    """预筛候选：未用同号、单笔不超过目标；超过 max_candidates 时只留日期最近的几笔。
+
+    返回候选在窗口内的下标；不可能凑出目标（少于 2 笔或最大 max_group 笔之和仍不足）时返回 None。
+    """
+    idx = np.flatnonzero(free & (cents <= target + tol_cents))
+    if len(idx) > max_candidates:
+        idx = np.sort(idx[np.argsort(np.abs(offset_ns[idx]), kind="mergesort")[:max_candidates]])
+    if len(idx) < 2 or np.sort(cents[idx])[-max_group:].sum() < target - tol_cents:
+        return None
+    return idx
+
+
+def _match_direction(one, many, one_label, many_label, tol_days, tol_amt, max_group, max_candidates,
+                     used_one, used_many):
+    """对 `one` 的每一笔，在日期窗口内 `many` 的未用同号记录中找合计相符的组合"""
+    one_ns = _to_ns(one["date"])
+    order = np.argsort(_to_ns(many["date"]), kind="mergesort")
+    many_ns = _to_ns(many["date"])[order]
+    many_net = many["net"].to_numpy(dtype=float)[order]
+    many_cents = _to_cents(many_net)
+    one_net = one["net"].to_numpy(dtype=float)
+    tol_cents = int(round(tol_amt * 100))
+    tol = tol_days * _NS_PER_DAY
+
+    groups = []
+    for i in np.argsort(one_ns, kind="mergesort"):
+        if used_one[i] or one_net[i] == 0:
+            continue
+        lo = np.searchsorted(many_ns, one_ns[i] - tol, side="left")
+        hi = np.searchsorted(many_ns, one_ns[i] + tol, side="right")
+        target = int(_to_cents(one_net[i]))
+        free = ~used_many[order[lo:hi]] & (np.sign(many_net[lo:hi]) == np.sign(one_net[i]))
+        idx = _prefilter(many_cents[lo:hi], many_ns[lo:hi] - one_ns[i], free, target, tol_cents,
+                         max_group, max_candidates)
+        if idx is None:
+            continue
+        candidates = order[lo:hi][idx]
+        found = find_subset(many_cents[lo:hi][idx], target, tol_cents, max_group)
+        if found is None or len(found) < 2:
+            continue
+        members = candidates[found]
+        used_one[i] = True
+        used_many[members] = True
+        total = float(many["net"].iloc[members].sum())
+        groups.append({
+            "方向": f"{one_label}1对{many_label}多",
+            f"{one_label}行": [one.index[i]],
+            f"{many_label}行": list(many.index[members]),
+            f"{one_label}金额": float(one_net[i]),
+            f"{many_label}合计": total,
+            "差额": abs(total - float(one_net[i])),
+        })
+    return groups
+
+
+def match_split_transactions(corp, bank, tol_days=3, tol_amt=0.01, max_group=5, max_candidates=16):
+    """拆分交易匹配：一笔银行流水对应多行公司账（如一次付清的付工厂货款），或反之。
+
+    基于 net 列在 ±tol_days 窗口内的同号未用记录中做有界子集和搜索，
+    每行最多属于一个组。候选先按符号、金额上限预筛，再只留日期最近的 max_candidates 笔，
+    保证总走折半查找；tol_amt 默认精确到分——窗口内记录一多，宽容差下随便几笔都能凑出目标。
+    返回 (组明细 DataFrame, 公司账每行的组号 Series)。
+    """
+    corp_valid = corp[corp["date"].notna()]
+    bank_valid = bank[bank["date"].notna()]
+    used_corp = np.zeros(len(corp_valid), dtype=bool)
+    used_bank = np.zeros(len(bank_valid), dtype=bool)
+
+    groups = _match_direction(bank_valid, corp_valid, "银行", "账", tol_days, tol_amt, max_group,
+                              max_candidates, used_bank, used_corp)
+    groups += _match_direction(corp_valid, bank_valid, "账", "银行", tol_days, tol_amt, max_group,
+                               max_candidates, used_corp, used_bank)
+
+    result = pd.DataFrame(groups, columns=["方向", "银行行", "账行", "银行金额", "账合计", "账金额", "银行合计", "差额"])
+    result.insert(0, "组号", range(1, len(result) + 1))
+
+    group_of_row = pd.Series(np.nan, index=corp.index, name="拆分组号")
+    for gid, rows in zip(result["组号"], result["账行"]):
+        group_of_row.loc[rows] = gid
+    return result, group_of_row
@@ -0,0 +1,216 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# ============================
+# 合成对账数据：与 corp*.csv 同表头的公司账 + 对应银行流水 + 真实对应关系
+# ============================
+# 每个“事件”是一笔真实业务，按类型生成：
+#   one        公司账 1 行 ↔ 银行 1 行
+#   bank_split 公司账 1 行 ↔ 银行多行（银行分几次入账）
+#   book_split 公司账多行 ↔ 银行 1 行（一次付清多张单）
+#   book_only  只在公司账（银行漏记 / 未达）
+#   bank_only  只在银行（手续费、利息等未入账）
+# 银行日期相对公司账有 0..jitter_days 天抖动；金额、日期文本加格式噪声。
+# 余额两侧一致：都取账户真实余额（全部事件按发生顺序累计），每个事件的最后一行等于该事件后的真实余额，
+# 拆分的中间行是事件前余额加已入账部分。单边事件（book_only / bank_only）因此是已知的未达账项：
+# 一侧的余额里含有另一侧才有的金额。同一事件两侧最后一行余额相同，这就是余额匹配的真实对应。
+# 全部向量化生成：10^6 行约 20 秒，10^7 行约几分钟（主要花在金额格式化上）。
+# 用法示例：
+#   python synth_ledger.py --rows 100000 --out-dir synth --seed 7
+
+BOOK_HEADER = ["日期", "明细摘要", "打款单位", "豪爵车款", "配件款", "广宣及装修款", "转存", "其他", "累计",
+               "付工厂货款", "广宣及装修品", "公司费用", "财务费用", "转存、保证金、还敞口", "其他", "累计", "余额"]
+# 在 BOOK_HEADER 中的位置（“其他”“累计”重名，只能按位置写）
+_INCOME_POS = [3, 4, 5, 6, 7]
+_EXPENSE_POS = [9, 10, 11, 12, 13, 14]
+BANK_HEADER = ["起息日", "交易类型", "对方户名", "借方金额", "贷方金额", "余额"]
+
+# (列位置, 收入?, 摘要模板, 银行交易类型, 银行对方户名（None = 取打款单位）, 金额量级, 权重)
+CATEGORIES = [
+    (3, True, "货款收取", "转账收入", None, 1e5, 30),
+    (4, True, "配件款收取", "转账收入", None, 2e4, 8),
+    (5, True, "广宣款收取", "转账收入", None, 1e4, 3),
+    (6, True, "广发海源路支行转入", "行内转账 转入", "广发银行海源路支行", 5e5, 4),
+    (7, True, "利息收入", "结息", "", 2e4, 2),
+    (9, False, "付江门豪爵成车款", "网银支付", "江门豪爵摩托车有限公司", 3e6, 10),
+    (10, False, "付广宣及装修品款", "网银支付", "昆明广宣装饰有限公司", 1e4, 3),
+    (11, False, "付物流公司配件快递费", "网银支付", "云南易速达物流有限公司", 1e4, 15),
+    (12, False, "银行手续费", "手续费", "", 50, 5),
+    (13, False, "转存工行宜良支行", "行内转账 转出", "工行宜良支行", 5e5, 6),
+    (14, False, "付其他款项", "网银支付", "", 5e3, 4),
+]
+PAYERS = ["威信县鑫茂摩托车销售店", "临翔区博尚镇阿强车行", "河口县桥头乡泉佳摩托车行", "富宁腾顺商贸有限责任公司",
+          "江门豪爵", "常州豪爵", "云南易速达物流有限公司", "昆明煤气（集团）控股有限公司", "重庆竣南物流", "团购广宣品款"]
+
+KINDS = ["one", "bank_split", "book_split", "book_only", "bank_only"]
+
+
+def _partition(rng, amounts_cents, counts):
+    """把每个金额（分）随机拆成 counts 份，份额之和精确等于原金额"""
+    # counts 可以为 0（该侧没有这笔），用 bincount 按 owner 汇总，不能用 reduceat
+    owner = np.repeat(np.arange(len(counts)), counts)
+    weights = rng.random(len(owner)) + 0.2
+    totals = np.bincount(owner, weights, minlength=len(counts))
+    parts = np.floor(amounts_cents[owner] * weights / totals[owner]).astype(np.int64)
+    present = counts > 0
+    starts = (np.cumsum(counts) - counts)[present]
+    shortfall = amounts_cents - np.bincount(owner, parts, minlength=len(counts)).astype(np.int64)
+    parts[starts] += shortfall[present]
+    return owner, parts
+
+
+def _running_balance(event, net, before):
+    """按事件排序的行 → 余额：事件前真实余额 + 本事件已入账部分"""
+    if not len(event):
+        return np.zeros(0, dtype=np.int64)
+    cum = np.cumsum(net)
+    first = np.flatnonzero(np.r_[True, event[1:] != event[:-1]])
+    offset = np.repeat((cum - net)[first], np.diff(np.r_[first, len(event)]))
+    return before[event] + cum - offset
+
+
+def _fmt_amounts(rng, cents, noise_rate, blank="-"):
+    """分 → 文本：千分位两位小数；部分取值加噪声（无千分位、空格、货币符号）；0 → blank"""
+    values = cents / 100.0
+    text = pd.Series(values).map("{:,.2f}".format)
+    noisy = rng.random(len(text)) < noise_rate
+    if noisy.any():
+        style = rng.integers(0, 3, noisy.sum())
+        raw = text[noisy]
+        plain = pd.Series(values[noisy], index=raw.index).map("{:.2f}".format)
+        text[noisy] = np.select([style == 0, style == 1], [plain, " " + raw + " "], "¥" + raw)
+    text[cents == 0] = blank
+    return text.to_numpy(dtype=object)
+
+
+def _fmt_signed(rng, cents, noise_rate):
+    """余额：负数可能写成全角减号或括号"""
+    text = _fmt_amounts(rng, np.abs(cents), noise_rate, blank="0.00")
+    neg = cents < 0
+    style = rng.integers(0, 3, neg.sum())
+    text[neg] = np.select([style == 0, style == 1], ["-" + text[neg], "－" + text[neg]], "(" + text[neg] + ")")
+    return text
+
+
+def generate_ledger(n_rows=10_000, seed=0, start="2025-01-01", days=365, jitter_days=2, jitter_rate=0.3,
+                    split_rate=0.03, missing_rate=0.02, noise_rate=0.05, opening=10_000_000.0):
+    """生成 (公司账 DataFrame, 银行流水 DataFrame, 真实对应 DataFrame)。
+
+    公司账列与 corp*.csv 完全一致（含重名的 其他 / 累计）；银行流水列见 BANK_HEADER。
+    真实对应表每行一个 (book_row, bank_row) 对，行号为各自数据行的 0 基位置
+    （公司账第 0 行是“上月结存”）；只在一侧出现的事件对端为 -1。
+    两侧余额都按账户真实余额给出（见文件头），同一事件两侧的最后一行余额相同。
+    """
+    rng = np.random.default_rng(seed)
+    n = max(int(n_rows), 1)
+
+    probs = np.array([1 - 2 * split_rate - 2 * missing_rate, split_rate, split_rate, missing_rate, missing_rate])
+    kind = rng.choice(len(KINDS), size=n, p=probs / probs.sum())
+    weights = np.array([c[6] for c in CATEGORIES], dtype=float)
+    cat = rng.choice(len(CATEGORIES), size=n, p=weights / weights.sum())
+    is_income = np.array([c[1] for c in CATEGORIES])[cat]
+    scale = np.array([c[5] for c in CATEGORIES])[cat]
+    cents = np.maximum(np.round(rng.lognormal(0, 0.8, n) * scale * 100), 100).astype(np.int64)
+    day = np.sort(rng.integers(0, days, n))
+    lag = np.where(rng.random(n) < jitter_rate, rng.integers(0, jitter_days + 1, n), 0)
+    has_payer = np.array([c[4] is None for c in CATEGORIES])[cat]
+    payer = np.where(has_payer, np.array(PAYERS, dtype=object)[rng.integers(0, len(PAYERS), n)], "")
+    counterparty = np.where(has_payer, payer, np.array([c[4] or "" for c in CATEGORIES], dtype=object)[cat])
+
+    # 公司账行：book_split 拆成 2..4 行，bank_only 没有
+    book_counts = np.where(kind == KINDS.index("book_split"), rng.integers(2, 5, n), 1)
+    book_counts[kind == KINDS.index("bank_only")] = 0
+    b_event, b_cents = _partition(rng, cents, book_counts)
+    # 银行行：bank_split 拆成 2..4 行，book_only 没有
+    bank_counts = np.where(kind == KINDS.index("bank_split"), rng.integers(2, 5, n), 1)
+    bank_counts[kind == KINDS.index("book_only")] = 0
+    k_event, k_cents = _partition(rng, cents, bank_counts)
+
+    # 账户真实余额：全部事件按发生顺序累计，before[e] 为事件 e 之前的余额
+    net = np.where(is_income, cents, -cents)
+    before = int(round(opening * 100)) + np.cumsum(net) - net
+
+    origin = pd.Timestamp(start)
+    # ---------- 公司账 ----------
+    b_sign = np.where(is_income[b_event], 1, -1)
+    balance = _running_balance(b_event, b_sign * b_cents, before)
+    income_cum = np.cumsum(np.where(b_sign > 0, b_cents, 0))
+    expense_cum = np.cumsum(np.where(b_sign < 0, b_cents, 0))
+    dates = (origin + pd.to_timedelta(day[b_event], unit="D")).strftime("%d/%m/%Y")
+
+    m = len(b_event) + 1
+    columns = [np.full(m, "", dtype=object) for _ in BOOK_HEADER]
+    columns[0][:] = np.concatenate([[origin.strftime("%d/%m/%Y")], dates])
+    summaries = np.array([c[2] for c in CATEGORIES], dtype=object)[cat[b_event]]
+    columns[1][:] = np.concatenate([["上月结存"], summaries])
+    columns[2][:] = np.concatenate([[""], payer[b_event]])
+    book_pos = np.array([c[0] for c in CATEGORIES])[cat[b_event]]
+    for pos in _INCOME_POS + _EXPENSE_POS:
+        hit = book_pos == pos
+        if hit.any():
+            columns[pos][1:][hit] = _fmt_amounts(rng, b_cents[hit], noise_rate, blank="")
+    columns[8][1:] = _fmt_amounts(rng, income_cum, noise_rate)
+    columns[15][1:] = _fmt_amounts(rng, expense_cum, noise_rate)
+    columns[16][:] = _fmt_signed(rng, np.concatenate([[int(round(opening * 100))], balance]), noise_rate)
+    book = pd.DataFrame(dict(enumerate(columns)))
+    book.columns = BOOK_HEADER
+
+    # ---------- 银行流水（按银行日期排序） ----------
+    k_balance = _running_balance(k_event, np.where(is_income[k_event], k_cents, -k_cents), before)
+    k_day = day[k_event] + lag[k_event]
+    order = np.lexsort((np.arange(len(k_event)), k_day))
+    k_event, k_cents, k_day, k_balance = k_event[order], k_cents[order], k_day[order], k_balance[order]
+    k_income = is_income[k_event]
+    k_dates = pd.Series(origin + pd.to_timedelta(k_day, unit="D"))
+    date_text = k_dates.dt.strftime("%Y-%m-%d")
+    slash = rng.random(len(date_text)) < noise_rate
+    date_text[slash] = k_dates[slash].dt.strftime("%Y/%m/%d")
+    bank = pd.DataFrame({
+        "起息日": date_text.to_numpy(),
+        "交易类型": np.array([c[3] for c in CATEGORIES], dtype=object)[cat[k_event]],
+        "对方户名": counterparty[k_event],
+        "借方金额": _fmt_amounts(rng, np.where(k_income, 0, k_cents), noise_rate),
+        "贷方金额": _fmt_amounts(rng, np.where(k_income, k_cents, 0), noise_rate),
+        "余额": _fmt_signed(rng, k_balance, noise_rate),
+    })
+
+    # ---------- 真实对应 ----------
+    book_rows = pd.DataFrame({"event": b_event, "book_row": np.arange(1, m)})
+    bank_rows = pd.DataFrame({"event": k_event, "bank_row": np.arange(len(k_event))})
+    truth = book_rows.merge(bank_rows, on="event", how="outer").fillna(-1).astype(np.int64)
+    truth["kind"] = np.array(KINDS, dtype=object)[kind[truth["event"].to_numpy()]]
+    truth = truth.sort_values(["event", "book_row", "bank_row"], kind="mergesort").reset_index(drop=True)
+    return book, bank, truth[["event", "kind", "book_row", "bank_row"]]
+
+
+def write_ledger(book, bank, truth, out_dir, name="synth"):
+    """写出 corp_<name>.csv / bank_<name>.csv / truth_<name>.csv，返回三个路径"""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = [os.path.join(out_dir, f"{prefix}_{name}.csv") for prefix in ("corp", "bank", "truth")]
+    for df, path in zip((book, bank, truth), paths):
+        df.to_csv(path, index=False)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成合成公司账 / 银行流水 / 真实对应关系")
+    parser.add_argument("--rows", type=int, default=10_000, help="业务事件数（约等于行数），1e3 ~ 1e7")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--jitter-days", type=int, default=2)
+    parser.add_argument("--jitter-rate", type=float, default=0.3)
+    parser.add_argument("--split-rate", type=float, default=0.03)
+    parser.add_argument("--missing-rate", type=float, default=0.02)
+    parser.add_argument("--noise-rate", type=float, default=0.05)
+    parser.add_argument("--out-dir", default="synth")
+    parser.add_argument("--name", default=None, help="文件名后缀，缺省为行数")
+    args = parser.parse_args()
+
+    book, bank, truth = generate_ledger(
+        args.rows, seed=args.seed, jitter_days=args.jitter_days, jitter_rate=args.jitter_rate,
+        split_rate=args.split_rate, missing_rate=args.missing_rate, noise_rate=args.noise_rate
+    )
+    for path in write_ledger(book, bank, truth, args.out_dir, args.name or str(args.rows)):
+        print(f"✅ {path}")
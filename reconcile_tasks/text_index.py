@@ -0,0 +1,126 @@
+import re
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+# ============================
+# 摘要 / 交易类型 / 对方户名 的字符 n-gram 倒排索引
+# ============================
+# 中文摘要没有空格分词，直接取 2、3 字 n-gram（如 “广发海源路支行转入” → 广发、发海、…、广发海、…），
+# 以银行流水为语料算 idf，向量做 L2 归一化，打分即余弦相似度。
+# 倒排表存成 CSC/CSR 稀疏矩阵：单条查询只取命中 n-gram 的倒排列相加；批量打分按候选对逐行点积。
+
+NGRAM_SIZES = (2, 3)
+_NOISE_RE = re.compile(r"[\s\d.,:;/\\\-_()（）【】\[\]，。：；、“”\"'·]+")
+
+
+def normalize_text(text):
+    """去掉空白、数字与标点；数字多为金额/日期/账号，对文本相似度是噪声"""
+    if text is None or text != text:  # None / NaN
+        return ""
+    return _NOISE_RE.sub("", str(text)).lower()
+
+
+def char_ngrams(text, sizes=NGRAM_SIZES):
+    text = normalize_text(text)
+    grams = [text[i:i + n] for n in sizes for i in range(len(text) - n + 1)]
+    # 只有一个字的文本也给它一个“n-gram”，否则永远打 0 分
+    return grams or ([text] if text else [])
+
+
+class NgramIndex:
+    """银行侧文本的 n-gram 索引。
+
+    texts: 每笔银行记录的文本（交易类型 + 对方户名等拼接）。
+    search(query) 返回按相似度降序的 (行号, 分数)；pair_scores(queries, rows, cols)
+    对 (查询行, 银行行) 候选对批量打分。
+    """
+
+    def __init__(self, texts, sizes=NGRAM_SIZES):
+        self.sizes = sizes
+        self.vocab = {}
+        indptr, indices = [0], []
+        for text in texts:
+            ids = {self.vocab.setdefault(g, len(self.vocab)) for g in char_ngrams(text, sizes)}
+            indices.extend(ids)
+            indptr.append(len(indices))
+        n_docs, n_terms = len(indptr) - 1, len(self.vocab)
+        indices = np.asarray(indices, dtype=np.int64)
+        df = np.bincount(indices, minlength=n_terms)
+        self.idf = np.log((1 + n_docs) / (1 + df)) + 1.0
+        self.matrix = _l2_rows(csr_matrix((self.idf[indices], indices, indptr), shape=(n_docs, n_terms)))
+        self.postings = self.matrix.tocsc()
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def vectorize(self, texts):
+        """把查询文本映射到银行词表（词表外的 n-gram 忽略），返回 L2 归一化的 CSR 矩阵"""
+        indptr, indices = [0], []
+        for text in texts:
+            ids = {self.vocab[g] for g in char_ngrams(text, self.sizes) if g in self.vocab}
+            indices.extend(ids)
+            indptr.append(len(indices))
+        indices = np.asarray(indices, dtype=np.int64)
+        return _l2_rows(csr_matrix((self.idf[indices], indices, indptr), shape=(len(indptr) - 1, len(self.vocab))))
+
+    def search(self, query, top_k=10, rows=None):
+        """单条查询：只累加命中 n-gram 的倒排列；rows 给定时只在这些银行行中排序"""
+        q = self.vectorize([query])
+        if q.nnz == 0:
+            return []
+        if rows is None:
+            scores = np.asarray(self.postings[:, q.indices] @ q.data).ravel()
+        else:
+            # 只算窗口内的行：代价与窗口大小成正比，与流水总行数无关
+            rows = np.asarray(rows)
+            scores = np.asarray(self.matrix[rows] @ q.T.toarray()).ravel()
+        hit = np.flatnonzero(scores > 0)
+        top = hit[np.argsort(-scores[hit], kind="mergesort")[:top_k]]
+        labels = top if rows is None else rows[top]
+        return list(zip(labels.tolist(), scores[top].tolist()))
+
+    def pair_scores(self, query_matrix, query_rows, bank_rows, chunk=100_000):
+        """候选对批量余弦相似度：query_matrix 来自 vectorize()，两组行号一一对应；
+        分块计算，临时稀疏矩阵的内存只与 chunk 有关"""
+        scores = np.zeros(len(query_rows))
+        for start in range(0, len(query_rows), chunk):
+            stop = start + chunk
+            product = query_matrix[query_rows[start:stop]].multiply(self.matrix[bank_rows[start:stop]])
+            scores[start:stop] = np.asarray(product.sum(axis=1)).ravel()
+        return scores
+
+
+def _l2_rows(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return csr_matrix(matrix.multiply(1.0 / norms[:, None]))
+
+
+def join_text(df, cols):
+    """把若干文本列拼成一列（缺列、空值跳过）"""
+    present = [c for c in cols if c in df]
+    if not present:
+        return np.array([""] * len(df), dtype=object)
+    parts = df[present].astype(object).where(df[present].notna(), "")
+    return parts.astype(str).agg(" ".join, axis=1).to_numpy()
+
+
+def make_pair_scorer(corp, bank, corp_cols, bank_cols):
+    """为一对公司账/银行表建索引，返回 scorer(公司账位置, 银行位置) → 相似度数组"""
+    index = NgramIndex(join_text(bank, bank_cols))
+    queries = index.vectorize(join_text(corp, corp_cols))
+    return lambda corp_pos, bank_pos: index.pair_scores(queries, corp_pos, bank_pos)
+
+
+def prune_by_text(rows, score, n_rows, min_score, eligible=None):
+    """剪枝掩码：只在有歧义的行里剪——该行有 ≥2 个 eligible 候选（如余额都在容差内），
+    且其中有候选达到 min_score 时，丢弃其余低于阈值的 eligible 候选。
+    没有歧义、或摘要过于笼统（都达不到阈值）的行保留全部候选，交给金额匹配；
+    非 eligible 的候选（容差外）从不剪，以免丢掉“余额异常”的诊断结果"""
+    eligible = np.ones(len(rows), dtype=bool) if eligible is None else eligible
+    n_eligible = np.bincount(rows[eligible], minlength=n_rows)
+    row_best = np.zeros(n_rows)
+    np.maximum.at(row_best, rows[eligible], score[eligible])
+    ambiguous = (n_eligible[rows] >= 2) & (row_best[rows] >= min_score)
+    return ~eligible | ~ambiguous | (score >= min_score)
@@ -0,0 +1,144 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from matching import _NS_PER_DAY, _to_ns, iter_candidate_pairs
+
+# ============================
+# 跨账户内部转账匹配（转存 / 转存、保证金、还敞口 / “广发海源路支行转入” 这类）
+# ============================
+# N 份银行流水合并成一张表，按 (金额分, 日期) 组合成一个整数键排序；
+# 每笔转出只需在转入表里二分查找 [同金额, 日期 ± tol_days] 这段连续区间，
+# 总代价 O(N log N)，而不是两两对比每对流水。
+
+TRANSFER_COLUMNS = ["转账组号", "转出账户", "转出日期", "转入账户", "转入日期", "金额", "日差"]
+
+# 日期占键的低 20 位（按天计，约 2870 年），金额分占高位
+_DAY_BITS = 20
+
+
+def _keys(cents, days):
+    return (cents << _DAY_BITS) + days
+
+
+def load_statements(paths, load_bank, profile):
+    """读取多份银行流水并合并，account 列取文件名（不含扩展名）"""
+    frames = []
+    for path in paths:
+        bank = load_bank(path, profile)
+        bank.insert(0, "account", os.path.splitext(os.path.basename(path))[0])
+        frames.append(bank)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def match_transfers(banks, tol_days=1):
+    """在合并流水中配对内部转账的两条腿：A 账户转出 x、B 账户 ±tol_days 内转入 x（B ≠ A）。
+
+    金额按分精确相等；候选按日差、再按出现顺序贪心一对一配对。
+    返回 (配对明细 DataFrame, banks 每行的转账组号 Series)。
+    """
+    valid = banks["date"].notna().to_numpy() & (banks["net"].to_numpy() != 0)
+    pos = np.flatnonzero(valid)
+    net = banks["net"].to_numpy(dtype=float)[pos]
+    cents = np.round(np.abs(net) * 100).astype(np.int64)
+    days = _to_ns(banks["date"])[pos] // _NS_PER_DAY
+    days = days - days.min() if len(days) else days
+    account = pd.factorize(banks["account"])[0][pos]
+
+    out_idx = np.flatnonzero(net < 0)
+    in_idx = np.flatnonzero(net > 0)
+    in_keys = _keys(cents[in_idx], days[in_idx])
+    order = np.argsort(in_keys, kind="mergesort")
+    in_idx, in_keys = in_idx[order], in_keys[order]
+
+    out_cents, out_days = cents[out_idx], days[out_idx]
+    lo = np.searchsorted(in_keys, _keys(out_cents, out_days - tol_days), side="left")
+    hi = np.searchsorted(in_keys, _keys(out_cents, out_days + tol_days), side="right")
+
+    pairs = []
+    for rows, cols in iter_candidate_pairs(lo, hi):
+        o, i = out_idx[rows], in_idx[cols]
+        keep = account[o] != account[i]
+        pairs.append((o[keep], i[keep]))
+    if pairs:
+        o, i = (np.concatenate(parts) for parts in zip(*pairs))
+    else:
+        o = i = np.array([], dtype=np.int64)
+
+    # 贪心：日差小的优先，同日差按转出、转入在表中的先后
+    gap = np.abs(days[o] - days[i])
+    order = np.lexsort((i, o, gap))
+    used_out = np.zeros(len(pos), dtype=bool)
+    used_in = np.zeros(len(pos), dtype=bool)
+    chosen = []
+    for k in order:
+        a, b = o[k], i[k]
+        if used_out[a] or used_in[b]:
+            continue
+        used_out[a] = used_in[b] = True
+        chosen.append((a, b))
+
+    chosen.sort(key=lambda ab: (days[ab[0]], ab[0]))
+    out_rows = banks.index[pos[[a for a, _ in chosen]]] if chosen else banks.index[:0]
+    in_rows = banks.index[pos[[b for _, b in chosen]]] if chosen else banks.index[:0]
+    result = pd.DataFrame({
+        "转账组号": np.arange(1, len(chosen) + 1),
+        "转出账户": banks.loc[out_rows, "account"].to_numpy(),
+        "转出日期": banks.loc[out_rows, "date"].to_numpy(),
+        "转入账户": banks.loc[in_rows, "account"].to_numpy(),
+        "转入日期": banks.loc[in_rows, "date"].to_numpy(),
+        "金额": np.abs(banks.loc[in_rows, "net"].to_numpy(dtype=float)),
+        "日差": np.abs(days[[a for a, _ in chosen]] - days[[b for _, b in chosen]]) if chosen else [],
+        "转出行": out_rows,
+        "转入行": in_rows,
+    }, columns=TRANSFER_COLUMNS + ["转出行", "转入行"])
+
+    group_of_row = pd.Series(np.nan, index=banks.index, name="转账组号")
+    group_of_row.loc[out_rows] = result["转账组号"].to_numpy()
+    group_of_row.loc[in_rows] = result["转账组号"].to_numpy()
+    return result, group_of_row
+
+
+def link_book_transfers(corp, transfers, account, tol_days=1):
+    """把公司账的转存行（transfer ≠ 0）挂到本账户那条腿上：转入记在 income 侧、转出记在 expense 侧。
+
+    同样按 (金额分, 日期) 键二分查找，每个转账组至多挂一行。返回公司账每行的转账组号 Series。
+    """
+    linked = pd.Series(np.nan, index=corp.index, name="转账组号")
+    if transfers.empty or "transfer" not in corp:
+        return linked
+
+    # 本账户在每组中的那条腿：转入为正、转出为负
+    legs = pd.concat([
+        pd.DataFrame({"gid": transfers["转账组号"], "date": transfers["转入日期"], "amount": transfers["金额"]})
+        [transfers["转入账户"] == account],
+        pd.DataFrame({"gid": transfers["转账组号"], "date": transfers["转出日期"], "amount": -transfers["金额"]})
+        [transfers["转出账户"] == account],
+    ], ignore_index=True)
+    book = corp[corp["date"].notna() & (corp["transfer"].fillna(0) != 0)]
+    if legs.empty or book.empty:
+        return linked
+
+    for sign in (1, -1):
+        leg = legs[np.sign(legs["amount"]) == sign]
+        rows = book[np.sign(book["transfer"]) == sign]
+        if leg.empty or rows.empty:
+            continue
+        base = min(_to_ns(leg["date"]).min(), _to_ns(rows["date"]).min()) // _NS_PER_DAY
+        leg_keys = _keys(np.round(leg["amount"].abs().to_numpy() * 100).astype(np.int64),
+                         _to_ns(leg["date"]) // _NS_PER_DAY - base)
+        order = np.argsort(leg_keys, kind="mergesort")
+        leg_keys, leg_gid = leg_keys[order], leg["gid"].to_numpy()[order]
+        book_cents = np.round(rows["transfer"].abs().to_numpy() * 100).astype(np.int64)
+        book_days = _to_ns(rows["date"]) // _NS_PER_DAY - base
+        lo = np.searchsorted(leg_keys, _keys(book_cents, book_days - tol_days), side="left")
+        hi = np.searchsorted(leg_keys, _keys(book_cents, book_days + tol_days), side="right")
+        taken = np.zeros(len(leg_keys), dtype=bool)
+        for r in range(len(rows)):
+            free = np.flatnonzero(~taken[lo[r]:hi[r]])
+            if len(free):
+                k = lo[r] + free[0]
+                taken[k] = True
+                linked.loc[rows.index[r]] = leg_gid[k]
+    return linked
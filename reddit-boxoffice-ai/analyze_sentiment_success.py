@@ -3,17 +3,22 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-from sklearn.preprocessing import LabelEncoder
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report, confusion_matrix
 import os
+from src.storage import dataset_exists, read_posts
+from src.features import SENTIMENT_SCORES, FeatureStore
+from src.movies import release_dates
+from src.model import FEATURES, MOVIE_FEATURES, add_movie_features, train_or_load
 
 # Step 0: Ensure folders exist
 os.makedirs("plots", exist_ok=True)
 
 # Step 1: Load sentiment data and create label file
-sentiment_df = pd.read_csv("data/reddit_sentiment.csv")
+# Only the columns the model uses are read from the Parquet dataset
+if dataset_exists("sentiment"):
+    sentiment_df = read_posts("sentiment", columns=["movie", "sentiment", "combined_text"])
+else:
+    sentiment_df = pd.read_csv("data/reddit_sentiment.csv")
 
 # Define manual box office success labels
 label_data = pd.DataFrame({
@@ -32,9 +37,14 @@ sentiment_df.to_csv("data/reddit_sentiment_labeled.csv", index=False)
 df = sentiment_df.copy()
 
 # Step 3: Encode sentiment and extract basic text features
-label_map = {"positive": 1, "neutral": 0, "negative": -1}
-df["sentiment_score"] = df["sentiment"].str.lower().map(label_map)
-df["comment_length"] = df["combined_text"].fillna("").apply(len)
+df["sentiment_score"] = df["sentiment"].str.lower().map(SENTIMENT_SCORES)
+df["comment_length"] = df["combined_text"].fillna("").str.len()
+
+# Movie-level window aggregates are maintained incrementally by tag_sentiment.py
+movie_features = FeatureStore(release_dates).features(wide=True)
+movie_features.to_csv("data/movie_features.csv", index=False)
+print(f"🗂️ Movie-level features for {len(movie_features)} movies saved to data/movie_features.csv")
+df = add_movie_features(df, movie_features)
 
 print("🧪 Unique sentiment values:", df["sentiment"].dropna().unique())
 # Drop rows with missing labels or features
@@ -44,21 +54,19 @@ print(f"📊 Rows after filtering: {len(df)}")
 print(df[['movie', 'sentiment', 'sentiment_score', 'success_tag']].head())
 
 # Step 4: Model preparation
-X = df[["sentiment_score", "comment_length"]]
+X = df[FEATURES + MOVIE_FEATURES]
 y = df["success_tag"]
+groups = df["movie"]
 
-le = LabelEncoder()
-y_encoded = le.fit_transform(y)
-
-X_train, X_test, y_train, y_test = train_test_split(X, y_encoded, test_size=0.3, random_state=42, stratify=y_encoded)
-
-# Step 5: Train model
-model = RandomForestClassifier(random_state=42)
-model.fit(X_train, y_train)
-y_pred = model.predict(X_test)
+# Step 5: Grouped CV search; the best model is cached under a hash of the training data
+bundle = train_or_load(X, y, groups, n_jobs=-1)
+le = bundle["label_encoder"]
+y_test = le.transform(y)
+# Out-of-fold predictions are computed once with the search and stored in the bundle
+y_pred = bundle["oof_predictions"]
 
 # Step 6: Results
-print("\n🎯 Classification Report:")
+print("\n🎯 Classification Report (out-of-fold, grouped by movie):")
 print(classification_report(y_test, y_pred, target_names=le.classes_))
 
 cm = confusion_matrix(y_test, y_pred, labels=range(len(le.classes_)))
@@ -0,0 +1,47 @@
+# benchmark_tagging.py
+import time
+import pandas as pd
+from src.dedup import add_cluster_ids
+from src.mock_openai import MockOpenAIServer
+from src.sentiment_tagger import OpenAIBackend, StubBackend
+
+# Benchmarks tagging strategies against the local mock server, so no API key or spend is needed
+df = pd.read_csv("data/reddit_comments_raw.csv")
+df["combined_text"] = df["title"].fillna("") + " " + df["text"].fillna("")
+texts = list(df["combined_text"])
+
+server = MockOpenAIServer(latency=0.05, jitter=0.02, rate_limit_rate=0.05, error_rate=0.01).start()
+print(f"🧪 Mock chat-completions server at {server.url} ({len(texts)} posts)")
+
+clustered = add_cluster_ids(df, text_column="combined_text")
+representatives = list(clustered.loc[clustered["dup_cluster"] == clustered.index, "combined_text"])
+
+strategies = [
+    ("openai sequential", lambda: OpenAIBackend(api_key="mock", base_url=server.url), texts, 1),
+    ("openai 8 threads", lambda: OpenAIBackend(api_key="mock", base_url=server.url), texts, 8),
+    ("openai 8 threads + dedup", lambda: OpenAIBackend(api_key="mock", base_url=server.url), representatives, 8),
+    ("stub", lambda: StubBackend(), texts, 1),
+]
+
+results = []
+for name, make_backend, inputs, workers in strategies:
+    backend = make_backend()
+    before = dict(server.stats)
+    start = time.perf_counter()
+    labels = backend.classify_many(inputs, max_workers=workers)
+    elapsed = time.perf_counter() - start
+    results.append({
+        "strategy": name,
+        "posts": len(texts),
+        "calls": len(inputs),
+        "seconds": round(elapsed, 2),
+        # Throughput is measured over all posts covered, since dedup labels the skipped ones for free
+        "posts_per_sec": round(len(texts) / elapsed, 1),
+        "cost_per_1k_posts_usd": round(backend.cost() / len(texts) * 1000, 4),
+        "errors": labels.count("Error"),
+        "http_429": server.stats["rate_limited"] - before["rate_limited"],
+    })
+    print(f"⏱️ {name}: {results[-1]['posts_per_sec']} posts/sec")
+
+server.stop()
+print(pd.DataFrame(results).to_string(index=False))
@@ -2,44 +2,65 @@
 # main.py
 import os
 import pandas as pd
-from src.scraper import scrape_reddit_posts
-from src.utils import is_pre_release
-
-release_dates = {
-    "dune2": "2024-03-01",
-    "venom2": "2021-10-01",
-    "thewildrobot": "2024-09-20",
-    "gladiator": "2000-05-05",
-    "backtoblack": "2024-04-12"
-}
-
-search_terms_map = {
-    "dune2": ["dune 2", "dune part two", "dune sequel"],
-    "venom2": ["venom 2", "venom sequel", "carnage"],
-    "thewildrobot": ["the wild robot movie"],
-    "gladiator": ["gladiator", "gladiator movie", "gladiator 2000"],
-    "backtoblack": ["back to black", "amy winehouse movie"]
-}
+from src.scraper import scrape_movies, load_watermarks, save_watermarks
+from src.features import flag_pre_release
+from src.movies import release_dates, search_terms_map
+from src.storage import write_posts
+from src.comments import CommentCache, harvest_comments
+
+raw_path = "data/reddit_comments_raw.csv"
+watermark_path = "data/scrape_watermarks.json"
+
+# One shared client; all (movie, term) searches run concurrently and only fetch posts newer than the last run
+print(f"🎬 Scraping Reddit for {len(search_terms_map)} movies...")
+watermarks = load_watermarks(watermark_path)
+new_df = scrape_movies(search_terms_map, max_posts=50, watermarks=watermarks)
+print(f"🆕 {len(new_df)} new posts fetched")
 
 all_data = []
+if os.path.exists(raw_path):
+    all_data.append(pd.read_csv(raw_path, parse_dates=["post_date"]))
 
-for movie, terms in search_terms_map.items():
-    print(f"🎬 Scraping Reddit for {movie}...")
-    df = scrape_reddit_posts(movie, terms, max_posts=50)
+new_rows = []
+for movie in search_terms_map:
+    df = new_df[new_df["movie"] == movie].copy() if not new_df.empty else new_df
     if df.empty:
-        print(f"⚠️ No data for {movie}")
+        print(f"⚠️ No new data for {movie}")
         continue
 
-    df["pre_release"] = df["post_date"].apply(lambda d: is_pre_release(d, release_dates[movie]))
+    df["pre_release"] = flag_pre_release(df, release_dates)
     all_data.append(df)
+    new_rows.append(df)
 
 # Save all scraped data
 if all_data:
     combined_df = pd.concat(all_data, ignore_index=True)
-    combined_df.to_csv("data/reddit_comments_raw.csv", index=False)
+    combined_df = combined_df.drop_duplicates(subset=["movie", "post_id"], keep="last")
+    combined_df.to_csv(raw_path, index=False)
+    save_watermarks(watermarks, watermark_path)
+    # Append only this run's posts to the Parquet datasets
+    if new_rows:
+        new_posts = pd.concat(new_rows, ignore_index=True)
+        write_posts(new_posts, "raw", key=["movie", "post_id"])
+        write_posts(new_posts[new_posts["pre_release"] == True], "prerelease", key=["movie", "post_id"])
+
+    # Optional: expand comment trees and store them in the same Parquet datasets as posts.
+    # The whole run is written at once (one part file per movie); comments of a
+    # re-expanded thread that are already stored are skipped by comment id.
+    if os.getenv("HARVEST_COMMENTS") == "1":
+        cache = CommentCache()
+        frames = [c for c in harvest_comments(combined_df, cache=cache, max_depth=3, max_comments=200) if not c.empty]
+        n_comments = 0
+        if frames:
+            comments = pd.concat(frames, ignore_index=True)
+            comments["pre_release"] = flag_pre_release(comments, release_dates)
+            n_comments = write_posts(comments, "raw", key=["movie", "post_id"])
+            write_posts(comments[comments["pre_release"] == True], "prerelease", key=["movie", "post_id"])
+        cache.save()
+        print(f"💬 Stored {n_comments} new comments")
+
     pre_release_df = combined_df[combined_df["pre_release"] == True]
     pre_release_df.to_csv("data/reddit_comments_prerelease.csv", index=False)
     print(f"✅ Saved {len(pre_release_df)} pre-release posts across {len(pre_release_df['movie'].unique())} movies.")
 else:
     print("❌ No Reddit data collected.")
-
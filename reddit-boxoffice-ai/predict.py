@@ -0,0 +1,23 @@
+# predict.py
+import sys
+import time
+import pandas as pd
+from src.features import SENTIMENT_SCORES, FeatureStore
+from src.model import add_movie_features, load_model, predict
+from src.movies import release_dates
+
+# Usage: python predict.py data/new_movie_sentiment.csv
+input_path = sys.argv[1] if len(sys.argv) > 1 else "data/reddit_sentiment.csv"
+
+df = pd.read_csv(input_path, usecols=["movie", "sentiment", "combined_text"])
+df["sentiment_score"] = df["sentiment"].str.lower().map(SENTIMENT_SCORES)
+df["comment_length"] = df["combined_text"].fillna("").str.len()
+df = add_movie_features(df, FeatureStore(release_dates).features(wide=True))
+
+start = time.perf_counter()
+bundle = load_model()
+scores = predict(df, bundle)
+elapsed_ms = (time.perf_counter() - start) * 1000
+
+print(f"🔮 Scored {len(scores)} movies with model {bundle['data_hash']} in {elapsed_ms:.1f} ms")
+print(scores.to_string(index=False))
@@ -0,0 +1,119 @@
+# src/comments.py
+import json
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+from src.scraper import RateLimiter, ThreadClients
+from src.utils import convert_utc_to_date
+
+
+class CommentCache:
+    """Remembers the comment count each post had when its tree was last expanded"""
+
+    def __init__(self, path="data/comment_cache.json"):
+        self.path = path
+        self.lock = threading.Lock()
+        self.seen = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.seen = json.load(f)
+
+    def is_fresh(self, post_id, comments_count):
+        return self.seen.get(post_id) == int(comments_count)
+
+    def mark(self, post_id, comments_count):
+        with self.lock:
+            self.seen[post_id] = int(comments_count)
+
+    def save(self):
+        with self.lock:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(self.seen, f)
+
+
+def expand_comment_tree(submission, max_depth=3, max_comments=200, more_limit=0):
+    """Breadth-first walk of a submission's comments within a depth and count budget.
+
+    `more_limit` caps how many "load more comments" stubs are expanded; each
+    one costs an extra API request.
+    """
+    submission.comment_sort = "top"
+    submission.comment_limit = max_comments
+    submission.comments.replace_more(limit=more_limit)
+
+    comments = []
+    frontier = deque((c, 0) for c in submission.comments)
+    while frontier and len(comments) < max_comments:
+        comment, depth = frontier.popleft()
+        if not hasattr(comment, "body"):
+            continue  # unexpanded MoreComments stub
+        comments.append((comment, depth))
+        if depth + 1 <= max_depth:
+            frontier.extend((reply, depth + 1) for reply in comment.replies)
+    return comments
+
+
+def _harvest_post(clients, post, max_depth, max_comments, more_limit, limiter):
+    limiter.acquire(cost=1 + more_limit)
+    submission = clients.get().submission(id=post["post_id"])
+    rows = []
+    for comment, depth in expand_comment_tree(submission, max_depth, max_comments, more_limit):
+        rows.append({
+            "movie": post["movie"],
+            "search_term": post["search_term"],
+            # Comments get their own id as post_id so (movie, post_id) stays unique downstream
+            "post_id": comment.id,
+            "link_id": post["post_id"],
+            "parent_id": comment.parent_id,
+            "depth": depth,
+            "kind": "comment",
+            "title": "",
+            "text": comment.body,
+            "upvotes": comment.score,
+            "comments_count": 0,
+            "created_utc": comment.created_utc,
+            "post_date": convert_utc_to_date(comment.created_utc)
+        })
+    return pd.DataFrame(rows)
+
+
+def harvest_comments(posts_df, reddit_factory=None, cache=None, limiter=None, max_depth=3,
+                     max_comments=200, more_limit=0, max_workers=8):
+    """Yield one DataFrame of comments per post, fetching many trees concurrently.
+
+    Posts whose comments_count matches the cache are skipped without any
+    request. The cache is updated as trees are expanded; call `cache.save()`
+    once the yielded frames have been stored. A thread that changed is
+    re-expanded in full, so store the frames with
+    `write_posts(..., key=["movie", "post_id"])` to keep each comment once.
+    PRAW is not thread-safe, so each worker gets its own client from
+    `reddit_factory` (default: scraper.new_reddit).
+    """
+    clients = ThreadClients(reddit_factory)
+    cache = cache or CommentCache()
+    limiter = limiter or RateLimiter()
+
+    posts = posts_df[posts_df["kind"] != "comment"] if "kind" in posts_df else posts_df
+    stale = [
+        post for post in posts.to_dict("records")
+        if post["comments_count"] > 0 and not cache.is_fresh(post["post_id"], post["comments_count"])
+    ]
+    print(f"💬 Expanding comment trees for {len(stale)} posts ({len(posts) - len(stale)} unchanged or empty)")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_harvest_post, clients, post, max_depth, max_comments, more_limit, limiter): post
+            for post in stale
+        }
+        for future in as_completed(futures):
+            post = futures[future]
+            try:
+                comments = future.result()
+            except Exception as e:
+                print(f"❌ Error expanding comments for {post['post_id']}: {e}")
+                continue
+            cache.mark(post["post_id"], post["comments_count"])
+            yield comments
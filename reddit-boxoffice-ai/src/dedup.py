@@ -0,0 +1,122 @@
+# src/dedup.py
+import re
+import zlib
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+# (a * x + b) mod p with p = 2^31 - 1: x, a, b < 2^31, so a * x + b < 2^62 and
+# the arithmetic never wraps in uint64
+_MERSENNE_PRIME = (1 << 31) - 1
+_MAX_HASH = _MERSENNE_PRIME
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def shingle_text(text, k=5):
+    """Return the set of k-word shingles (hashed to 32 bits) for a text"""
+    tokens = _TOKEN_RE.findall(str(text).lower())
+    if not tokens:
+        return set()
+    if len(tokens) < k:
+        return {zlib.crc32(" ".join(tokens).encode("utf-8"))}
+    return {
+        zlib.crc32(" ".join(tokens[i:i + k]).encode("utf-8"))
+        for i in range(len(tokens) - k + 1)
+    }
+
+
+class MinHasher:
+    """Compute MinHash signatures with a fixed family of universal hash functions"""
+
+    def __init__(self, num_perm=128, seed=42):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.a = rng.randint(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, shingles):
+        """Return a uint64 signature vector for a set of hashed shingles"""
+        if not shingles:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        hv = np.fromiter(shingles, dtype=np.uint64, count=len(shingles)) % np.uint64(_MERSENNE_PRIME)
+        # (a * x + b) mod p; one row per shingle
+        phv = (np.outer(hv, self.a) + self.b) % np.uint64(_MERSENNE_PRIME)
+        return phv.min(axis=0)
+
+
+class LSHIndex:
+    """Banded locality-sensitive hash index over MinHash signatures"""
+
+    def __init__(self, num_perm=128, bands=32):
+        if num_perm % bands != 0:
+            raise ValueError("num_perm must be divisible by bands")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.buckets = [defaultdict(list) for _ in range(bands)]
+
+    def insert(self, key, signature):
+        """Add a signature and return the keys already sharing a bucket with it"""
+        candidates = set()
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows]
+            bucket = self.buckets[band][chunk.tobytes()]
+            candidates.update(bucket)
+            bucket.append(key)
+        return candidates
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def find_duplicate_clusters(texts, threshold=0.8, num_perm=128, bands=32, shingle_size=5):
+    """Group exact and near-duplicate texts; return one cluster id per text.
+
+    The cluster id is the position of the cluster's representative (its first
+    member), so ``cluster_ids[i] == i`` marks the texts that need labelling.
+    """
+    texts = list(texts)
+    hasher = MinHasher(num_perm=num_perm)
+    index = LSHIndex(num_perm=num_perm, bands=bands)
+    parent = list(range(len(texts)))
+    exact = {}
+    signatures = []
+
+    for i, text in enumerate(texts):
+        normalized = " ".join(_TOKEN_RE.findall(str(text).lower()))
+        # Exact duplicates short-circuit the MinHash work entirely
+        if normalized in exact:
+            signatures.append(None)
+            parent[i] = exact[normalized]
+            continue
+        exact[normalized] = i
+
+        sig = hasher.signature(shingle_text(text, k=shingle_size))
+        signatures.append(sig)
+        for j in index.insert(i, sig):
+            # Verify LSH candidates with the estimated Jaccard similarity
+            if np.mean(signatures[j] == sig) >= threshold:
+                ri, rj = _find(parent, i), _find(parent, j)
+                if ri != rj:
+                    parent[max(ri, rj)] = min(ri, rj)
+
+    return np.array([_find(parent, i) for i in range(len(texts))])
+
+
+def add_cluster_ids(df, text_column="combined_text", threshold=0.8, **kwargs):
+    """Return a copy of df with a `dup_cluster` column of representative row positions"""
+    df = df.copy()
+    df["dup_cluster"] = find_duplicate_clusters(df[text_column].fillna(""), threshold=threshold, **kwargs)
+    return df
+
+
+def propagate_labels(df, labels, cluster_column="dup_cluster"):
+    """Broadcast labels of cluster representatives to every row in their cluster.
+
+    `labels` maps representative row positions to labels.
+    """
+    return pd.Series(df[cluster_column].map(labels).values, index=df.index)
@@ -0,0 +1,164 @@
+# src/features.py
+import os
+
+import numpy as np
+import pandas as pd
+
+SENTIMENT_SCORES = {"positive": 1, "neutral": 0, "negative": -1}
+DEFAULT_WINDOWS = (7, 30, 90, 365)
+
+# Additive per-(movie, window) sums; every feature is a ratio of these, so new posts just add on
+_STAT_COLUMNS = [
+    "volume", "scored", "weight_sum", "weighted_sentiment_sum", "sentiment_sum",
+    "days_to_release_sum", "comment_length_sum", "upvotes_sum"
+]
+# Per-post inputs of those sums, kept so a changed post can be taken back out
+_KEY_COLUMNS = ["movie", "post_id"]
+_POST_COLUMNS = ["pre_release", "days_to_release", "comment_length", "upvotes", "sentiment_score"]
+
+
+def flag_pre_release(df, release_dates):
+    """Vectorized is_pre_release: parse each movie's release date once, compare whole columns"""
+    release = pd.to_datetime(df["movie"].map(release_dates))
+    return pd.to_datetime(df["post_date"]) < release
+
+
+def add_post_features(df, release_dates):
+    """Vectorized per-post features: pre_release, days_to_release, comment_length, sentiment_score"""
+    df = df.copy()
+    post_date = pd.to_datetime(df["post_date"])
+    release = pd.to_datetime(df["movie"].map(release_dates))
+    df["pre_release"] = flag_pre_release(df, release_dates)
+    df["days_to_release"] = (release - post_date).dt.total_seconds() / 86400.0
+    if "combined_text" in df:
+        df["comment_length"] = df["combined_text"].fillna("").str.len()
+    else:
+        df["comment_length"] = df["title"].fillna("").str.len() + 1 + df["text"].fillna("").str.len()
+    if "sentiment" in df:
+        df["sentiment_score"] = df["sentiment"].str.lower().str.strip().map(SENTIMENT_SCORES)
+    return df
+
+
+def _window_stats(posts, windows):
+    """Sum the additive stats for every (movie, window) in one groupby per window"""
+    weights = posts["upvotes"].fillna(0).clip(lower=0) + 1
+    score = posts["sentiment_score"] if "sentiment_score" in posts else pd.Series(np.nan, index=posts.index)
+    scored = score.notna()
+    base = pd.DataFrame({
+        "movie": posts["movie"],
+        "volume": 1,
+        "scored": scored.astype(int),
+        "weight_sum": weights.where(scored, 0),
+        "weighted_sentiment_sum": (weights * score).fillna(0),
+        "sentiment_sum": score.fillna(0),
+        "days_to_release_sum": posts["days_to_release"],
+        "comment_length_sum": posts["comment_length"],
+        "upvotes_sum": posts["upvotes"].fillna(0),
+    })
+
+    frames = []
+    for window in windows:
+        in_window = posts["pre_release"] & (posts["days_to_release"] <= window)
+        stats = base[in_window].groupby("movie")[_STAT_COLUMNS].sum()
+        stats["window_days"] = window
+        frames.append(stats.reset_index())
+    if not frames:
+        return pd.DataFrame(columns=["movie", "window_days"] + _STAT_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _derive(stats):
+    out = stats[["movie", "window_days", "volume"]].copy()
+    volume = stats["volume"].replace(0, np.nan)
+    scored = stats["scored"].replace(0, np.nan)
+    out["weighted_sentiment"] = stats["weighted_sentiment_sum"] / stats["weight_sum"].replace(0, np.nan)
+    out["mean_sentiment"] = stats["sentiment_sum"] / scored
+    out["velocity"] = stats["volume"] / stats["window_days"]
+    out["mean_days_to_release"] = stats["days_to_release_sum"] / volume
+    out["mean_comment_length"] = stats["comment_length_sum"] / volume
+    out["mean_upvotes"] = stats["upvotes_sum"] / volume
+    return out
+
+
+def compute_movie_features(df, release_dates, windows=DEFAULT_WINDOWS):
+    """Per-movie, per-pre-release-window aggregates computed in one vectorized pass"""
+    posts = add_post_features(df, release_dates)
+    return _derive(_window_stats(posts, windows))
+
+
+class FeatureStore:
+    """Cached movie-level features that are updated incrementally as posts arrive.
+
+    The additive sums are persisted together with each counted post's inputs
+    (sentiment, upvotes, ...), so `update` costs time proportional to the new or
+    changed posts: a re-tagged post has its old contribution subtracted and its
+    new one added.
+    """
+
+    def __init__(self, release_dates, path="data/feature_store", windows=DEFAULT_WINDOWS):
+        self.release_dates = release_dates
+        self.windows = tuple(windows)
+        self.stats_path = os.path.join(path, "stats.csv")
+        self.posts_path = os.path.join(path, "posts.csv")
+        os.makedirs(path, exist_ok=True)
+        self.posts = self._load(self.posts_path, _KEY_COLUMNS + _POST_COLUMNS)
+        self.posts["post_id"] = self.posts["post_id"].astype(str)
+        # Sums without the posts behind them cannot be corrected, so they start over
+        if self.posts.empty:
+            self.stats = pd.DataFrame(columns=["movie", "window_days"] + _STAT_COLUMNS)
+        else:
+            self.stats = self._load(self.stats_path, ["movie", "window_days"] + _STAT_COLUMNS)
+
+    @staticmethod
+    def _load(path, columns):
+        if os.path.exists(path):
+            return pd.read_csv(path, float_precision="round_trip")
+        return pd.DataFrame(columns=columns)
+
+    def update(self, df):
+        """Fold in new and re-tagged posts; returns the number of posts added or changed"""
+        df = df.drop_duplicates(subset=_KEY_COLUMNS, keep="last")
+        posts = add_post_features(df, self.release_dates)
+        posts = posts.reindex(columns=_KEY_COLUMNS + _POST_COLUMNS)
+        posts["post_id"] = posts["post_id"].astype(str)
+
+        merged = posts.merge(self.posts, on=_KEY_COLUMNS, how="left", suffixes=("", "_old"), indicator=True)
+        changed = merged["_merge"] == "left_only"
+        for col in _POST_COLUMNS:
+            new, old = merged[col], merged[f"{col}_old"]
+            changed |= ~((new == old) | (new.isna() & old.isna()))
+        changed = changed.to_numpy()
+        if not changed.any():
+            return 0
+
+        updated = posts[changed]
+        keys = pd.MultiIndex.from_frame(updated[_KEY_COLUMNS])
+        stored = pd.MultiIndex.from_frame(self.posts[_KEY_COLUMNS])
+        replaced = stored.isin(keys)
+
+        frames = [] if self.stats.empty else [self.stats]
+        frames.append(_window_stats(updated, self.windows))
+        if replaced.any():
+            old = _window_stats(self.posts[replaced], self.windows)
+            old[_STAT_COLUMNS] = -old[_STAT_COLUMNS]
+            frames.append(old)
+        self.stats = (
+            pd.concat(frames, ignore_index=True)
+            .groupby(["movie", "window_days"], as_index=False)[_STAT_COLUMNS].sum()
+        )
+        self.stats = self.stats[self.stats["volume"] > 0].reset_index(drop=True)
+        kept = self.posts[~replaced]
+        self.posts = updated.reset_index(drop=True) if kept.empty else pd.concat([kept, updated], ignore_index=True)
+
+        self.posts.to_csv(self.posts_path, index=False)
+        self.stats.to_csv(self.stats_path, index=False)
+        return int(changed.sum())
+
+    def features(self, wide=False):
+        """Return derived features, long (one row per movie/window) or wide (one row per movie)"""
+        features = _derive(self.stats)
+        if not wide:
+            return features
+        wide_df = features.pivot(index="movie", columns="window_days")
+        wide_df.columns = [f"{name}_{window}d" for name, window in wide_df.columns]
+        return wide_df.reset_index()
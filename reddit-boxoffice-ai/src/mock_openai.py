@@ -0,0 +1,108 @@
+# src/mock_openai.py
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.sentiment_tagger import StubBackend
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    """Minimal /v1/chat/completions endpoint with injectable latency and failures"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            self._send_json({"error": {"message": "not found"}}, status=404)
+            return
+
+        server = self.server
+        roll = server.next_roll()
+        with server.lock:
+            server.stats["requests"] += 1
+        if server.latency:
+            time.sleep(server.latency + random.uniform(0, server.jitter))
+
+        if roll < server.rate_limit_rate:
+            with server.lock:
+                server.stats["rate_limited"] += 1
+            self._send_json({"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+                            status=429, headers={"retry-after-ms": str(server.retry_after_ms)})
+            return
+        if roll < server.rate_limit_rate + server.error_rate:
+            with server.lock:
+                server.stats["errors"] += 1
+            self._send_json({"error": {"message": "Internal server error", "type": "server_error"}}, status=500)
+            return
+
+        prompt = request["messages"][-1]["content"]
+        label = server.labeler.classify(prompt)
+        prompt_tokens = max(1, len(prompt) // 4)
+        self._send_json({
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-3.5-turbo"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": label},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 1, "total_tokens": prompt_tokens + 1}
+        })
+
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    """Local chat-completions server; point OpenAIBackend(base_url=server.url) at it.
+
+    `rate_limit_rate` and `error_rate` are the fractions of requests answered
+    with 429 and 500; `latency` (+ uniform `jitter`) is added to every request.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency=0.0, jitter=0.0, rate_limit_rate=0.0, error_rate=0.0,
+                 retry_after_ms=50, seed=42, host="127.0.0.1", port=0):
+        super().__init__((host, port), MockOpenAIHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.retry_after_ms = retry_after_ms
+        self.labeler = StubBackend()
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "rate_limited": 0, "errors": 0}
+        self._rng = random.Random(seed)
+        self._thread = None
+
+    def next_roll(self):
+        with self.lock:
+            return self._rng.random()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,110 @@
+# src/mock_reddit.py
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class MockRedditHandler(BaseHTTPRequestHandler):
+    """Serves the OAuth token and subreddit search endpoints PRAW uses"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.startswith("/api/v1/access_token"):
+            self._send_json({"access_token": "mock-token", "token_type": "bearer",
+                             "expires_in": 3600, "scope": "*"})
+        else:
+            self._send_json({"error": 404}, status=404)
+
+    def _comment_listing(self, comments, link_id, parent_id):
+        children = []
+        for c in comments:
+            data = dict(c, link_id=f"t3_{link_id}", parent_id=parent_id, name=f"t1_{c['id']}")
+            data["replies"] = self._comment_listing(c.get("replies", []), link_id, f"t1_{c['id']}") \
+                if c.get("replies") else ""
+            children.append({"kind": "t1", "data": data})
+        return {"kind": "Listing", "data": {"after": None, "before": None, "children": children}}
+
+    def _send_comments(self, post_id):
+        post = next((p for posts in self.server.posts.values() for p in posts if p["id"] == post_id), None)
+        if post is None:
+            self._send_json({"error": 404}, status=404)
+            return
+        submission = {"kind": "Listing", "data": {"after": None, "before": None, "children": [
+            {"kind": "t3", "data": dict(post, name=f"t3_{post_id}")}
+        ]}}
+        comments = self.server.comments.get(post_id, [])
+        self._send_json([submission, self._comment_listing(comments, post_id, f"t3_{post_id}")])
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if "/search" not in url.path and not url.path.startswith("/comments/"):
+            self._send_json({"error": 404}, status=404)
+            return
+
+        self.server.request_count += 1
+        if url.path.startswith("/comments/"):
+            self._send_comments(url.path.strip("/").split("/")[1])
+            return
+        term = query.get("q", [""])[0]
+        limit = int(query.get("limit", ["25"])[0])
+        after = query.get("after", [None])[0]
+        posts = self.server.posts.get(term, [])
+        # Newest first, paged by the id passed in `after`
+        posts = sorted(posts, key=lambda p: p["created_utc"], reverse=True)
+        start = 0
+        if after:
+            ids = [f"t3_{p['id']}" for p in posts]
+            start = ids.index(after) + 1 if after in ids else len(posts)
+        page = posts[start:start + limit]
+        next_after = f"t3_{page[-1]['id']}" if start + limit < len(posts) and page else None
+        self._send_json({
+            "kind": "Listing",
+            "data": {
+                "after": next_after,
+                "before": None,
+                "children": [{"kind": "t3", "data": dict(p, name=f"t3_{p['id']}")} for p in page]
+            }
+        })
+
+
+class MockRedditServer(ThreadingHTTPServer):
+    """Local HTTP stand-in for the Reddit API, keyed by search term.
+
+    `posts` maps a search term to a list of dicts with id, title, selftext,
+    score, num_comments and created_utc. `comments` maps a post id to a list
+    of dicts with id, body, score, created_utc and nested `replies`.
+    """
+
+    def __init__(self, posts, comments=None, host="127.0.0.1", port=0):
+        super().__init__((host, port), MockRedditHandler)
+        self.posts = posts
+        self.comments = comments or {}
+        self.request_count = 0
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
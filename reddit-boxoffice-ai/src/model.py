@@ -0,0 +1,144 @@
+# src/model.py
+import hashlib
+import json
+import os
+from functools import lru_cache
+
+import joblib
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import GridSearchCV, GroupKFold, cross_val_predict
+from sklearn.preprocessing import LabelEncoder
+
+MODEL_DIR = "models"
+FEATURES = ["sentiment_score", "comment_length"]
+# Wide FeatureStore columns joined onto every post of the movie
+MOVIE_FEATURES = ["weighted_sentiment_30d", "velocity_30d", "mean_upvotes_30d"]
+
+PARAM_GRID = {
+    "n_estimators": [100, 300],
+    "max_depth": [None, 5, 10],
+    "min_samples_leaf": [1, 5],
+}
+
+
+def add_movie_features(df, movie_features, columns=MOVIE_FEATURES):
+    """Join movie-level window features onto posts; a movie with no posts in a window gets 0"""
+    movie_features = movie_features.reindex(columns=["movie"] + list(columns))
+    out = df.merge(movie_features, on="movie", how="left")
+    out[list(columns)] = out[list(columns)].fillna(0)
+    out.index = df.index
+    return out
+
+
+def data_hash(X, y, groups):
+    """Content hash of the training data, used as the model cache key"""
+    h = hashlib.sha256()
+    h.update(pd.util.hash_pandas_object(X, index=False).values.tobytes())
+    h.update(pd.util.hash_pandas_object(pd.Series(y, dtype=str), index=False).values.tobytes())
+    h.update(pd.util.hash_pandas_object(pd.Series(groups, dtype=str), index=False).values.tobytes())
+    h.update(json.dumps(PARAM_GRID, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def _group_cv(groups):
+    n_groups = pd.Series(groups).nunique()
+    if n_groups < 2:
+        raise ValueError("Grouped cross-validation needs posts from at least two movies")
+    return GroupKFold(n_splits=min(5, n_groups))
+
+
+def search_model(X, y, groups, param_grid=PARAM_GRID, n_jobs=-1):
+    """Cross-validated grid search with folds grouped by movie so no movie leaks across folds"""
+    search = GridSearchCV(
+        RandomForestClassifier(random_state=42),
+        param_grid,
+        cv=_group_cv(groups),
+        scoring="f1_macro",
+        n_jobs=n_jobs,
+    )
+    search.fit(X, y, groups=groups)
+    return search
+
+
+def out_of_fold_predictions(estimator, X, y, groups, n_jobs=-1):
+    """Grouped out-of-fold predictions for an honest classification report"""
+    return cross_val_predict(estimator, X, y, groups=groups, cv=_group_cv(groups), n_jobs=n_jobs)
+
+
+def _model_path(digest, model_dir):
+    return os.path.join(model_dir, f"success_rf_{digest}.joblib")
+
+
+def train_or_load(X, labels, groups, model_dir=MODEL_DIR, n_jobs=-1):
+    """Return the cached model bundle for this training data, searching only when the data changed.
+
+    The bundle also holds the grouped out-of-fold predictions ("oof_predictions",
+    encoded labels in the row order of X), so a cache hit needs no fitting at all.
+    """
+    digest = data_hash(X, labels, groups)
+    path = _model_path(digest, model_dir)
+    if os.path.exists(path):
+        bundle = load_model(path)
+        # Bundles saved before the out-of-fold predictions were stored are rebuilt once
+        if "oof_predictions" in bundle:
+            print(f"♻️ Training data unchanged ({digest}), reusing {path}")
+            _write_latest(path, digest, model_dir)
+            return bundle
+
+    le = LabelEncoder()
+    y = le.fit_transform(labels)
+    search = search_model(X, y, groups, n_jobs=n_jobs)
+    print(f"🏆 Best params: {search.best_params_} (macro F1 {search.best_score_:.3f})")
+
+    bundle = {
+        "model": search.best_estimator_,
+        "label_encoder": le,
+        "features": list(X.columns),
+        "best_params": search.best_params_,
+        "cv_score": search.best_score_,
+        "oof_predictions": out_of_fold_predictions(search.best_estimator_, X, y, groups, n_jobs=n_jobs),
+        "data_hash": digest,
+    }
+    os.makedirs(model_dir, exist_ok=True)
+    joblib.dump(bundle, path)
+    _write_latest(path, digest, model_dir)
+    return bundle
+
+
+def _write_latest(path, digest, model_dir):
+    with open(os.path.join(model_dir, "latest.json"), "w", encoding="utf-8") as f:
+        json.dump({"path": path, "data_hash": digest}, f)
+
+
+@lru_cache(maxsize=4)
+def _load_bundle(path, mtime):
+    return joblib.load(path)
+
+
+def load_model(path=None, model_dir=MODEL_DIR):
+    """Load a saved model bundle (the latest one by default).
+
+    latest.json is re-read on every call and bundles are cached per process
+    under their resolved path and modification time, so a retrain is picked up.
+    """
+    if path is None:
+        with open(os.path.join(model_dir, "latest.json"), "r", encoding="utf-8") as f:
+            path = json.load(f)["path"]
+    path = os.path.abspath(path)
+    return _load_bundle(path, os.path.getmtime(path))
+
+
+def predict(df, bundle=None):
+    """Score movies from their post-level features without retraining.
+
+    Returns one row per movie with the mean class probabilities over its
+    posts and the predicted success tag.
+    """
+    bundle = bundle or load_model()
+    model, le = bundle["model"], bundle["label_encoder"]
+    df = df.dropna(subset=bundle["features"])
+    proba = pd.DataFrame(model.predict_proba(df[bundle["features"]]), columns=le.classes_, index=df.index)
+    per_movie = proba.groupby(df["movie"]).mean()
+    per_movie["predicted_success"] = per_movie[list(le.classes_)].idxmax(axis=1)
+    return per_movie.reset_index()
@@ -0,0 +1,17 @@
+# src/movies.py
+
+release_dates = {
+    "dune2": "2024-03-01",
+    "venom2": "2021-10-01",
+    "thewildrobot": "2024-09-20",
+    "gladiator": "2000-05-05",
+    "backtoblack": "2024-04-12"
+}
+
+search_terms_map = {
+    "dune2": ["dune 2", "dune part two", "dune sequel"],
+    "venom2": ["venom 2", "venom sequel", "carnage"],
+    "thewildrobot": ["the wild robot movie"],
+    "gladiator": ["gladiator", "gladiator movie", "gladiator 2000"],
+    "backtoblack": ["back to black", "amy winehouse movie"]
+}
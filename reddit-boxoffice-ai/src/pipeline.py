@@ -0,0 +1,170 @@
+# src/pipeline.py
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from src.features import FeatureStore
+from src.scraper import RateLimiter, ThreadClients, get_watermark, iter_search_term, update_watermark
+from src.storage import write_posts
+from src.utils import is_pre_release
+
+OUTPUT_COLUMNS = [
+    "movie", "search_term", "post_id", "title", "text", "upvotes", "comments_count",
+    "created_utc", "post_date", "pre_release", "combined_text", "sentiment"
+]
+
+_DONE = object()
+
+
+class BoundedSeen:
+    """Set of recently seen keys that forgets the oldest once `maxsize` is reached"""
+
+    def __init__(self, maxsize=100_000):
+        self.maxsize = maxsize
+        self.keys = OrderedDict()
+
+    def add(self, key):
+        """Record key; return False if it was already present"""
+        if key in self.keys:
+            self.keys.move_to_end(key)
+            return False
+        self.keys[key] = None
+        if len(self.keys) > self.maxsize:
+            self.keys.popitem(last=False)
+        return True
+
+
+def _scrape_stage(search_terms_map, out_q, clients, max_posts, watermarks, workers, consumers, seen_size):
+    """Producer: push posts onto the queue as each search listing streams in"""
+    limiter = RateLimiter()
+    seen = BoundedSeen(seen_size)
+    lock = threading.Lock()
+
+    def fetch(movie, term):
+        since = get_watermark(watermarks, movie, term)
+        newest = None
+        count = 0
+        for row in iter_search_term(clients.get(), movie, term, max_posts, since, limiter):
+            count += 1
+            newest = max(newest or row["created_utc"], row["created_utc"])
+            with lock:
+                if not seen.add((movie, row["post_id"])):
+                    continue
+            out_q.put(row)  # blocks when downstream is behind
+        # As in scrape_movies: a listing cut off by max_posts keeps the old watermark
+        if newest is not None and count < max_posts:
+            with lock:
+                update_watermark(watermarks, movie, term, newest)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(fetch, movie, term)
+                       for movie, terms in search_terms_map.items() for term in terms]
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"❌ Scrape error: {e}")
+    finally:
+        for _ in range(consumers):
+            out_q.put(_DONE)
+
+
+def _filter_stage(in_q, out_q, release_dates, consumers):
+    """Keep pre-release posts with usable text and build `combined_text`"""
+    try:
+        while True:
+            row = in_q.get()
+            if row is _DONE:
+                break
+            row["pre_release"] = is_pre_release(row["post_date"], release_dates[row["movie"]])
+            if not row["pre_release"]:
+                continue
+            row["combined_text"] = f"{row['title'] or ''} {row['text'] or ''}"
+            if not row["combined_text"].strip():
+                continue
+            out_q.put(row)
+    finally:
+        for _ in range(consumers):
+            out_q.put(_DONE)
+
+
+def _tag_stage(in_q, out_q, classify):
+    try:
+        while True:
+            row = in_q.get()
+            if row is _DONE:
+                break
+            row["sentiment"] = classify(row["combined_text"][:2000])
+            out_q.put(row)
+    finally:
+        out_q.put(_DONE)
+
+
+def _write_batch(rows, dataset, store):
+    batch = pd.DataFrame(rows, columns=OUTPUT_COLUMNS)
+    written = write_posts(batch, dataset, key=["movie", "post_id"])
+    store.update(batch)
+    return written
+
+
+def _write_stage(in_q, dataset, store, producers, flush_every):
+    """Write tagged rows to the Parquet dataset and the feature store in batches of `flush_every`"""
+    rows = []
+    written = 0
+    finished = 0
+    while finished < producers:
+        row = in_q.get()
+        if row is _DONE:
+            finished += 1
+            continue
+        rows.append(row)
+        if len(rows) >= flush_every:
+            written += _write_batch(rows, dataset, store)
+            rows = []
+            print(f"💾 {written} tagged posts written")
+    if rows:
+        written += _write_batch(rows, dataset, store)
+    return written
+
+
+def run_pipeline(search_terms_map, release_dates, classify, dataset="sentiment", feature_store=None,
+                 max_posts=100, watermarks=None, reddit_factory=None, scrape_workers=4, tag_workers=4,
+                 queue_size=256, flush_every=500, seen_size=100_000):
+    """Stream scrape → pre-release filter → tag → storage with bounded queues between stages.
+
+    Tagged posts go where tag_sentiment.py puts them, so analyze_sentiment_success.py
+    sees them: appended to the Parquet `dataset` (posts already stored are skipped)
+    and folded into `feature_store` (a FeatureStore over `release_dates` by default).
+    `classify` takes a text and returns a sentiment label; it is called from
+    `tag_workers` threads. Each scrape worker gets its own client from
+    `reddit_factory`; cross-term duplicates are dropped using the last
+    `seen_size` post ids. Returns the number of rows written.
+    """
+    store = feature_store if feature_store is not None else FeatureStore(release_dates)
+    clients = ThreadClients(reddit_factory)
+    watermarks = watermarks if watermarks is not None else {}
+    raw_q = queue.Queue(maxsize=queue_size)
+    filtered_q = queue.Queue(maxsize=queue_size)
+    tagged_q = queue.Queue(maxsize=queue_size)
+
+    threads = [
+        threading.Thread(target=_scrape_stage, daemon=True,
+                         args=(search_terms_map, raw_q, clients, max_posts, watermarks, scrape_workers, 1,
+                               seen_size)),
+        threading.Thread(target=_filter_stage, daemon=True,
+                         args=(raw_q, filtered_q, release_dates, tag_workers)),
+    ]
+    threads += [
+        threading.Thread(target=_tag_stage, daemon=True, args=(filtered_q, tagged_q, classify))
+        for _ in range(tag_workers)
+    ]
+    for t in threads:
+        t.start()
+
+    written = _write_stage(tagged_q, dataset, store, tag_workers, flush_every)
+    for t in threads:
+        t.join()
+    return written
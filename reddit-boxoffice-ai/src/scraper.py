@@ -1,36 +1,180 @@
 # src/reddit_scraper.py
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
 import praw
 import pandas as pd
 from src.utils import convert_utc_to_date
 
-def init_reddit():
+# Reddit allows 100 OAuth requests per minute per client id; one listing page holds 100 posts
+REQUESTS_PER_MINUTE = 100
+PAGE_SIZE = 100
+
+
+def new_reddit(oauth_url=None, reddit_url=None):
+    """Return a new PRAW client; URLs can point at a local stand-in for the Reddit API"""
+    oauth_url = oauth_url or os.getenv("REDDIT_OAUTH_URL")
+    reddit_url = reddit_url or os.getenv("REDDIT_URL")
+    overrides = {}
+    if oauth_url:
+        overrides["oauth_url"] = oauth_url
+    if reddit_url:
+        overrides["reddit_url"] = reddit_url
     return praw.Reddit(
         client_id="DR8BeUQWlNnrHvtpu6ETiw",
         client_secret="kNI-2_5HPOzdJ_Yc7CDeW9tEzjbCiA",
-        user_agent="boxoffice-comment-scraper by /u/West_Definition6659"
+        user_agent="boxoffice-comment-scraper by /u/West_Definition6659",
+        **overrides
     )
 
-def scrape_reddit_posts(movie, search_terms, max_posts=100):
-    reddit = init_reddit()
-    subreddit = reddit.subreddit("movies")
-    
+
+@lru_cache(maxsize=None)
+def init_reddit(oauth_url=None, reddit_url=None):
+    """Return a shared PRAW client for single-threaded use (PRAW is not thread-safe)"""
+    return new_reddit(oauth_url, reddit_url)
+
+
+class ThreadClients:
+    """One PRAW client per worker thread, created lazily by `factory`"""
+
+    def __init__(self, factory=None):
+        self.factory = factory or new_reddit
+        self.local = threading.local()
+
+    def get(self):
+        if not hasattr(self.local, "reddit"):
+            self.local.reddit = self.factory()
+        return self.local.reddit
+
+
+class RateLimiter:
+    """Thread-safe token bucket shared by all scraping workers"""
+
+    def __init__(self, per_minute=REQUESTS_PER_MINUTE):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, cost=1):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= cost:
+                    self.tokens -= cost
+                    return
+                wait = (cost - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def load_watermarks(path):
+    """Load the per-(movie, term) newest created_utc seen on previous runs"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_watermarks(watermarks, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(watermarks, f, indent=2, sort_keys=True)
+
+
+def _watermark_key(movie, term):
+    return f"{movie}|{term}"
+
+
+def iter_search_term(reddit, movie, term, max_posts, since_utc=None, limiter=None):
+    """Yield posts for one search term, newest first, stopping at the watermark"""
+    print(f"🔍 Searching Reddit for: '{term}'")
+    if limiter is not None:
+        limiter.acquire(cost=max(1, math.ceil(max_posts / PAGE_SIZE)))
+    posts = reddit.subreddit("movies").search(term, sort="new", time_filter="all", limit=max_posts)
+
+    for post in posts:
+        if since_utc is not None and post.created_utc <= since_utc:
+            break
+        yield {
+            "movie": movie,
+            "search_term": term,
+            "post_id": post.id,
+            "kind": "post",
+            "title": post.title,
+            "text": post.selftext,
+            "upvotes": post.score,
+            "comments_count": post.num_comments,
+            "created_utc": post.created_utc,
+            "post_date": convert_utc_to_date(post.created_utc)
+        }
+
+
+def _search_term(clients, movie, term, max_posts, since_utc, limiter):
+    """Return (rows, complete); complete means the listing reached the watermark or
+    ran out before `max_posts`, so nothing between the watermark and the rows was skipped"""
+    rows = list(iter_search_term(clients.get(), movie, term, max_posts, since_utc, limiter))
+    return rows, len(rows) < max_posts
+
+
+def get_watermark(watermarks, movie, term):
+    return watermarks.get(_watermark_key(movie, term))
+
+
+def update_watermark(watermarks, movie, term, created_utc):
+    key = _watermark_key(movie, term)
+    watermarks[key] = max(created_utc, watermarks.get(key, created_utc))
+
+
+def scrape_movies(search_terms_map, max_posts=100, watermarks=None, reddit_factory=None,
+                  limiter=None, max_workers=8):
+    """Scrape every (movie, term) pair concurrently, one client per worker thread.
+
+    Posts are deduplicated on post_id within each movie. If `watermarks` is
+    given, only posts newer than the stored created_utc are fetched and the
+    dict is updated in place. A term's watermark only advances when its listing
+    reached the old watermark (or ran out); if `max_posts` cut it short, the
+    posts in between would otherwise never be fetched.
+    """
+    clients = ThreadClients(reddit_factory)
+    limiter = limiter or RateLimiter()
+    watermarks = watermarks if watermarks is not None else {}
+
+    jobs = {}
     all_data = []
-    for term in search_terms:
-        print(f"🔍 Searching Reddit for: '{term}'")
-        posts = subreddit.search(term, sort="new", time_filter="all", limit=max_posts)
-        
-        for post in posts:
-            post_date = convert_utc_to_date(post.created_utc)
-            all_data.append({
-                "movie": movie,
-                "search_term": term,
-                "post_id": post.id,
-                "title": post.title,
-                "text": post.selftext,
-                "upvotes": post.score,
-                "comments_count": post.num_comments,
-                "created_utc": post.created_utc,
-                "post_date": post_date
-            })
-
-    return pd.DataFrame(all_data)
\ No newline at end of file
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for movie, terms in search_terms_map.items():
+            for term in terms:
+                since = get_watermark(watermarks, movie, term)
+                future = executor.submit(_search_term, clients, movie, term, max_posts, since, limiter)
+                jobs[future] = (movie, term)
+
+        # Collect in submission order so deduplication keeps the same row on every run
+        for future, (movie, term) in jobs.items():
+            try:
+                rows, complete = future.result()
+            except Exception as e:
+                print(f"❌ Error scraping '{term}' for {movie}: {e}")
+                continue
+            if rows and complete:
+                update_watermark(watermarks, movie, term, max(row["created_utc"] for row in rows))
+            elif rows:
+                print(f"⚠️ '{term}' for {movie} hit max_posts={max_posts} before the last watermark; "
+                      f"watermark kept, raise max_posts to backfill")
+            all_data.extend(rows)
+
+    df = pd.DataFrame(all_data)
+    if df.empty:
+        return df
+    return df.drop_duplicates(subset=["movie", "post_id"]).reset_index(drop=True)
+
+
+def scrape_reddit_posts(movie, search_terms, max_posts=100, watermarks=None, reddit_factory=None):
+    return scrape_movies({movie: search_terms}, max_posts=max_posts,
+                         watermarks=watermarks, reddit_factory=reddit_factory)
@@ -1,30 +1,157 @@
 # src/sentiment_tagger.py
-import openai
+import os
+import re
+import threading
 import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 
-def init_openai(api_key):
-    openai.api_key = api_key
+LABELS = ("Positive", "Neutral", "Negative")
 
-def classify_sentiment(text):
-    prompt = f"""Classify the sentiment of this Reddit post as Positive, Neutral, or Negative. Only return the one word.
-Post: \"{text}\\""".strip()
+PROMPT = """Classify the sentiment of this Reddit post as Positive, Neutral, or Negative. Only return the one word.
+Post: \"{text}\\\""""
 
-    try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0
+# USD per 1k tokens for gpt-3.5-turbo (input, output)
+PRICING = {"gpt-3.5-turbo": (0.0005, 0.0015)}
+
+
+def normalize_label(raw):
+    """Map a model reply onto one of LABELS, or "Error" if none matches"""
+    raw = (raw or "").strip().lower()
+    for label in LABELS:
+        if raw.startswith(label.lower()):
+            return label
+    return "Error"
+
+
+class SentimentBackend(ABC):
+    """Common interface: classify one text, or many texts with a thread pool"""
+
+    name = "base"
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def classify(self, text):
+        """Return one of LABELS (or "Error") for a single text"""
+
+    def classify_many(self, texts, max_workers=1):
+        texts = [t[:2000] for t in texts]  # Token-safe
+        if max_workers <= 1:
+            return [self.classify(t) for t in texts]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(self.classify, texts))
+
+    def _add_usage(self, prompt_tokens, completion_tokens):
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+
+    def cost(self):
+        """Estimated USD spent so far; zero for backends that are not billed"""
+        return 0.0
+
+
+class OpenAIBackend(SentimentBackend):
+    """Chat-completions backend; base_url can point at src/mock_openai.py"""
+
+    name = "openai"
+
+    def __init__(self, api_key=None, model="gpt-3.5-turbo", base_url=None, max_retries=5, timeout=30):
+        super().__init__()
+        from openai import OpenAI
+
+        self.model = model
+        # The client retries 429s and 5xx responses with exponential backoff
+        self.client = OpenAI(
+            api_key=api_key or os.getenv("OPENAI_API_KEY"),
+            base_url=base_url or os.getenv("OPENAI_BASE_URL"),
+            max_retries=max_retries,
+            timeout=timeout,
         )
-        return response['choices'][0]['message']['content'].strip()
-    except Exception as e:
-        print(f"❌ Error: {e}")
-        return "Error"
-
-def classify_batch(df, text_column="combined_text", delay=1):
-    results = []
-    for i, text in enumerate(df[text_column]):
-        print(f"Tagging sentiment for row {i+1}/{len(df)}")
-        sentiment = classify_sentiment(text[:2000])  # Token-safe
-        results.append(sentiment)
-        time.sleep(delay)  # rate limit safety
+
+    def classify(self, text):
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": PROMPT.format(text=text).strip()}],
+                temperature=0
+            )
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            return "Error"
+        if response.usage is not None:
+            self._add_usage(response.usage.prompt_tokens, response.usage.completion_tokens)
+        return normalize_label(response.choices[0].message.content)
+
+    def cost(self):
+        input_price, output_price = PRICING.get(self.model, PRICING["gpt-3.5-turbo"])
+        return (self.prompt_tokens * input_price + self.completion_tokens * output_price) / 1000
+
+
+class LocalModelBackend(SentimentBackend):
+    """Runs a Hugging Face sentiment model locally (requires `transformers`)"""
+
+    name = "local"
+
+    def __init__(self, model="cardiffnlp/twitter-roberta-base-sentiment-latest", batch_size=32):
+        super().__init__()
+        from transformers import pipeline
+
+        self.batch_size = batch_size
+        self.pipe = pipeline("sentiment-analysis", model=model, truncation=True)
+
+    def classify(self, text):
+        return self.classify_many([text])[0]
+
+    def classify_many(self, texts, max_workers=1):
+        # The model batches internally, so threads would only contend for it
+        results = self.pipe([t[:2000] for t in texts], batch_size=self.batch_size)
+        return [normalize_label(r["label"]) for r in results]
+
+
+class StubBackend(SentimentBackend):
+    """Keyword heuristic with optional fake latency, for offline runs and benchmarks"""
+
+    name = "stub"
+    _POSITIVE = re.compile(r"\b(love|great|amazing|excited|hype|best|awesome)\b", re.I)
+    _NEGATIVE = re.compile(r"\b(hate|bad|worst|boring|disappoint\w*|awful)\b", re.I)
+
+    def __init__(self, latency=0.0):
+        super().__init__()
+        self.latency = latency
+
+    def classify(self, text):
+        if self.latency:
+            time.sleep(self.latency)
+        pos = len(self._POSITIVE.findall(text))
+        neg = len(self._NEGATIVE.findall(text))
+        if pos > neg:
+            return "Positive"
+        if neg > pos:
+            return "Negative"
+        return "Neutral"
+
+
+BACKENDS = {
+    "openai": OpenAIBackend,
+    "local": LocalModelBackend,
+    "stub": StubBackend,
+}
+
+
+def get_backend(name=None, **kwargs):
+    """Build a backend by name; defaults to $SENTIMENT_BACKEND or "openai" """
+    name = name or os.getenv("SENTIMENT_BACKEND", "openai")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown sentiment backend '{name}', expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name](**kwargs)
+
+
+def classify_batch(df, backend, text_column="combined_text", max_workers=4):
+    results = backend.classify_many(list(df[text_column].fillna("")), max_workers=max_workers)
+    print(f"🏷️ Tagged {len(results)} rows with the {backend.name} backend")
     return results
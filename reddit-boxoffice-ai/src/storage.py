@@ -0,0 +1,141 @@
+# src/storage.py
+import os
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+DATA_ROOT = "data/parquet"
+
+# Stable column types so append-only part files always unify into one dataset
+POST_SCHEMA = {
+    "search_term": pa.string(),
+    "post_id": pa.string(),
+    "title": pa.string(),
+    "text": pa.string(),
+    "upvotes": pa.int64(),
+    "comments_count": pa.int64(),
+    "created_utc": pa.float64(),
+    "post_date": pa.timestamp("us"),
+    "pre_release": pa.bool_(),
+    "sentiment": pa.string(),
+    "kind": pa.string(),
+    "link_id": pa.string(),
+    "parent_id": pa.string(),
+    "depth": pa.int64(),
+}
+
+_PARTITIONING = ds.partitioning(pa.schema([("movie", pa.string())]), flavor="hive")
+
+
+def dataset_path(name, root=DATA_ROOT):
+    return os.path.join(root, name)
+
+
+def _to_table(df):
+    # combined_text is title + " " + text, so it is rebuilt on read rather than stored twice
+    df = df.drop(columns=["combined_text"], errors="ignore").copy()
+    if "post_date" in df:
+        df["post_date"] = pd.to_datetime(df["post_date"])
+    fields = []
+    for col in df.columns:
+        if col in POST_SCHEMA:
+            fields.append(pa.field(col, POST_SCHEMA[col]))
+        elif col == "movie":
+            fields.append(pa.field(col, pa.string()))
+        else:
+            fields.append(pa.field(col, pa.Array.from_pandas(df[col]).type))
+    return pa.Table.from_pandas(df, schema=pa.schema(fields), preserve_index=False)
+
+
+def _stored_keys(name, root, key, movies):
+    """The `key` tuples already stored for the given movies (reads only the key columns)"""
+    table = _open(name, root).to_table(columns=key, filter=ds.field("movie").isin(list(movies)))
+    return pd.MultiIndex.from_frame(table.to_pandas().astype(str))
+
+
+def write_posts(df, name, root=DATA_ROOT, mode="append", key=None):
+    """Write rows to a Parquet dataset partitioned by movie.
+
+    mode="append" adds a new part file per movie and never touches existing
+    ones; mode="overwrite" replaces the partitions of the movies in df. With
+    `key` (e.g. ["movie", "post_id"]) an append skips rows whose key is already
+    stored or repeated in df, so re-fetched posts and comments are kept once.
+    Returns the number of rows written.
+    """
+    if key is not None:
+        df = df.drop_duplicates(subset=key, keep="last")
+        if mode == "append" and dataset_exists(name, root) and not df.empty:
+            keys = pd.MultiIndex.from_frame(df[key].astype(str))
+            df = df[~keys.isin(_stored_keys(name, root, key, df["movie"].unique()))]
+    if df.empty:
+        return 0
+    behavior = {"append": "overwrite_or_ignore", "overwrite": "delete_matching"}[mode]
+    ds.write_dataset(
+        _to_table(df),
+        base_dir=dataset_path(name, root),
+        format="parquet",
+        partitioning=_PARTITIONING,
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior=behavior,
+    )
+    return len(df)
+
+
+def _to_expression(filters):
+    expr = None
+    for col, value in (filters or {}).items():
+        if isinstance(value, (list, tuple, set)):
+            term = ds.field(col).isin(list(value))
+        else:
+            term = ds.field(col) == value
+        expr = term if expr is None else expr & term
+    return expr
+
+
+def dataset_exists(name, root=DATA_ROOT):
+    return os.path.isdir(dataset_path(name, root))
+
+
+def _open(name, root):
+    """Open a dataset whose part files may carry different columns (e.g. posts vs comments)"""
+    path = dataset_path(name, root)
+    dataset = ds.dataset(path, format="parquet", partitioning=_PARTITIONING)
+    schemas = []
+    for fragment in dataset.get_fragments():
+        if not any(fragment.physical_schema.equals(s) for s in schemas):
+            schemas.append(fragment.physical_schema)
+    if len(schemas) <= 1:
+        return dataset
+    schema = pa.unify_schemas(schemas + [pa.schema([("movie", pa.string())])])
+    return ds.dataset(path, format="parquet", partitioning=_PARTITIONING, schema=schema)
+
+
+def read_posts(name, columns=None, filters=None, root=DATA_ROOT):
+    """Load a dataset, reading only `columns` and pushing `filters` down to Parquet.
+
+    `filters` maps column names to a value or a list of accepted values,
+    e.g. {"pre_release": True, "movie": ["dune2", "venom2"]}. Requesting
+    `combined_text` reads title and text and rebuilds it.
+    """
+    dataset = _open(name, root)
+    read_cols = None
+    if columns is not None:
+        read_cols = [c for c in columns if c != "combined_text"]
+        if "combined_text" in columns:
+            read_cols += [c for c in ("title", "text") if c not in read_cols]
+
+    df = dataset.to_table(columns=read_cols, filter=_to_expression(filters)).to_pandas()
+    if columns is None or "combined_text" in columns:
+        df["combined_text"] = df["title"].fillna("") + " " + df["text"].fillna("")
+    if columns is not None:
+        df = df[list(columns)]
+    return df
+
+
+def csv_to_parquet(csv_path, name, root=DATA_ROOT):
+    """One-off migration of an existing CSV dump into a partitioned dataset"""
+    df = pd.read_csv(csv_path)
+    write_posts(df, name, root=root, mode="overwrite")
+    return len(df)
@@ -0,0 +1,31 @@
+# stream_pipeline.py
+import os
+from dotenv import load_dotenv
+from src.movies import release_dates, search_terms_map
+from src.pipeline import run_pipeline
+from src.sentiment_tagger import get_backend
+from src.scraper import load_watermarks, save_watermarks
+
+load_dotenv()
+backend_name = os.getenv("SENTIMENT_BACKEND", "openai")
+
+if backend_name == "openai" and not os.getenv("OPENAI_API_KEY"):
+    print("❌ OPENAI_API_KEY not found in .env")
+    exit()
+
+backend = get_backend(backend_name)
+
+# Own watermarks: the stream writes only the tagged "sentiment" dataset and the
+# feature store, so sharing main.py's file would make main.py skip these posts
+# for the raw CSV/Parquet datasets
+watermark_path = "data/stream_watermarks.json"
+watermarks = load_watermarks(watermark_path)
+written = run_pipeline(
+    search_terms_map,
+    release_dates,
+    backend.classify,
+    max_posts=50,
+    watermarks=watermarks
+)
+save_watermarks(watermarks, watermark_path)
+print(f"✅ Streamed {written} tagged pre-release posts into the sentiment dataset and feature store")
@@ -2,19 +2,22 @@
 import pandas as pd
 from dotenv import load_dotenv
 import os
-from openai import OpenAI
-import time
+from src.sentiment_tagger import get_backend
+from src.dedup import add_cluster_ids, propagate_labels
+from src.storage import write_posts
+from src.features import FeatureStore
+from src.movies import release_dates
 
 print("Loading .env and API key...")
 load_dotenv()
-api_key = os.getenv("OPENAI_API_KEY")
+backend_name = os.getenv("SENTIMENT_BACKEND", "openai")
 
-if not api_key:
+if backend_name == "openai" and not os.getenv("OPENAI_API_KEY"):
     print("❌ OPENAI_API_KEY not found in .env")
     exit()
 
-client = OpenAI(api_key=api_key)
-print("🔑 OpenAI client initialized.")
+backend = get_backend(backend_name)
+print(f"🔑 {backend.name} sentiment backend initialized.")
 
 # Load scraped Reddit data
 df_path = "data/reddit_comments_prerelease.csv"
@@ -36,31 +39,22 @@ if df.empty:
     print("⚠️ No usable comments to process.")
     exit()
 
-# Define inline sentiment classification function using updated API
-def classify_sentiment(text):
-    prompt = f"""Classify the sentiment of this Reddit post as Positive, Neutral, or Negative. Only return the one word.\nPost: \"{text}\\""".strip()
-    try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        print(f"❌ Error: {e}\n")
-        return "Error"
+# Cluster exact and near-duplicate posts so each cluster is tagged only once
+df = add_cluster_ids(df.reset_index(drop=True), text_column="combined_text", threshold=0.8)
+representatives = df[df["dup_cluster"] == df.index]
+print(f"🧬 {len(representatives)} unique posts to tag ({len(df) - len(representatives)} duplicates skipped)")
 
 # Run sentiment tagging
-sentiments = []
-for i, row in df.iterrows():
-    print(f"Tagging sentiment for row {i+1}/{len(df)}")
-    sentiment = classify_sentiment(row["combined_text"][:2000])
-    sentiments.append(sentiment)
-    time.sleep(1)
+labels = backend.classify_many(list(representatives["combined_text"]), max_workers=4)
+cluster_labels = dict(zip(representatives.index, labels))
+print(f"💸 Estimated tagging cost: ${backend.cost():.4f}")
 
-df["sentiment"] = sentiments
+df["sentiment"] = propagate_labels(df, cluster_labels)
 
 # Save results
 output_path = "data/reddit_sentiment.csv"
 df.to_csv(output_path, index=False)
+write_posts(df.drop(columns=["dup_cluster"]), "sentiment", mode="overwrite")
+new_posts = FeatureStore(release_dates).update(df)
+print(f"📈 Feature store updated with {new_posts} new posts")
 print(f"✅ Sentiment tagging complete. Saved to {output_path}")
\ No newline at end of file